@@ -0,0 +1,127 @@
+"""Static assets held in memory: read and compressed once, served with ETag revalidation"""
+import gzip
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preference order when the client accepts several (equal q-values)
+_ENCODINGS = ["br", "gzip", "identity"]
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; '*' applies to codings not listed"""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def _etags(header: str) -> List[str]:
+    """If-None-Match entity tags, weak prefixes dropped (revalidation uses weak comparison)"""
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+class StaticAsset:
+    """
+    One file read from the first existing path, kept with its gzip (and,
+    if the brotli package is installed, br) encodings. Each encoding gets its
+    own ETag derived from the content hash; a request whose If-None-Match
+    carries the tag of the encoding it would get receives 304 with no body.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        media_type: str,
+        fallback: str = "",
+        max_age: int = 0
+    ):
+        self.paths = paths
+        self.media_type = media_type
+        self.fallback = fallback
+        # 0 = let caches store it but revalidate on every use
+        self.cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        self._variants: Dict[str, Tuple[bytes, str]] = {}
+        self.not_modified = 0
+
+    def load(self) -> None:
+        body = None
+        for path in self.paths:
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+                break
+            except FileNotFoundError:
+                continue
+        if body is None:
+            body = self.fallback.encode()
+
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        variants = {"identity": (body, f'"{digest}"')}
+        # mtime=0 keeps the gzip bytes (and so its ETag) identical across restarts
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+        for coding, data in compressed.items():
+            if len(data) < len(body):
+                variants[coding] = (data, f'"{digest}-{coding}"')
+        self._variants = variants
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "encodings": {coding: len(data) for coding, (data, _) in self._variants.items()},
+            "not_modified": self.not_modified,
+        }
+
+    def _choose(self, accept_encoding: str) -> str:
+        accepted = _accepted(accept_encoding)
+        wildcard = accepted.get("*")
+
+        def q(coding: str) -> float:
+            if coding in accepted:
+                return accepted[coding]
+            if coding == "identity":
+                # Always acceptable unless ruled out, but least preferred
+                return 0.0 if wildcard == 0.0 else 0.001
+            return wildcard or 0.0
+
+        best_q, _, best = max(
+            (q(coding), -rank, coding)
+            for rank, coding in enumerate(_ENCODINGS)
+            if coding in self._variants
+        )
+        return best if best_q > 0 else "identity"
+
+    def response(self, request: Request) -> Response:
+        if not self._variants:
+            self.load()
+        coding = self._choose(request.headers.get("accept-encoding", ""))
+        body, etag = self._variants[coding]
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+        requested = _etags(request.headers.get("if-none-match", ""))
+        if "*" in requested or etag in requested:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type=self.media_type, headers=headers)
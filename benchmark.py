@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+DebateShield Lite - Offline benchmark harness
+
+Starts local stand-ins for the You.com search API and an OpenAI-compatible
+chat completions API (configurable latency and error injection), launches
+the real app against them in a subprocess with a throwaway database, and
+drives /analyze at a given concurrency. Reports latency percentiles,
+throughput, errors and cache hit rates. No API keys or network needed.
+
+Example:
+    python benchmark.py --requests 300 --concurrency 20 --unique-claims 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SUBJECTS = [
+    "vaccines", "5G towers", "drinking bleach", "the moon landing", "fluoride in water",
+    "a local bank", "the election", "garlic", "solar panels", "electric cars",
+]
+PREDICATES = [
+    "cause autism", "spread the virus", "cure COVID-19", "was staged", "controls minds",
+    "is collapsing tomorrow", "was rigged by millions of votes", "prevents cancer",
+    "drain the grid at night", "explode in cold weather",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_claims(n: int, seed: int) -> List[str]:
+    rnd = random.Random(seed)
+    claims = set()
+    while len(claims) < n:
+        claims.add(f"{rnd.choice(SUBJECTS)} {rnd.choice(PREDICATES)} ({rnd.randint(1, 10**6)})")
+    return sorted(claims)
+
+
+class Upstream:
+    """Latency / error knobs shared by the fake servers"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rnd = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    async def delay(self) -> None:
+        ms = max(0.0, self.latency_ms + self.rnd.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(ms / 1000)
+
+    def fail(self) -> Optional[JSONResponse]:
+        """Maybe inject a 429 or 503"""
+        self.calls += 1
+        if self.rnd.random() >= self.error_rate:
+            return None
+        self.errors += 1
+        status = self.rnd.choice([429, 503])
+        return JSONResponse({"error": "injected"}, status_code=status, headers={"Retry-After": "0"})
+
+
+def fake_you_app(upstream: Upstream) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/search")
+    async def search(query: str, count: int = 5):
+        await upstream.delay()
+        failure = upstream.fail()
+        if failure is not None:
+            return failure
+        web = [
+            {
+                "title": f"Result {i} for {query[:40]}",
+                "url": f"https://example.org/{abs(hash(query)) % 10**8}/{i}",
+                "snippets": [f"Snippet {i} discussing {query}. " * 3],
+            }
+            for i in range(count)
+        ]
+        return {"results": {"web": web}}
+
+    return app
+
+
+def _agent_output(system_prompt: str, decisive: bool) -> Dict[str, Any]:
+    if "TRIAGE" in system_prompt:
+        return {
+            "decisive": decisive, "verdict": "false", "confidence": 92 if decisive else 55,
+            "risk_level": "high", "topic": "health", "why_bullets": ["Reputable sources agree"],
+            "uncertainties": [], "evidence_for": [], "evidence_against": [],
+            "debate_transcript": [{"agent": "triage", "message": "Settled by reputable sources"}],
+            "reply_templates": {"neutral": "This is not accurate.", "firm_mod": "False claim.", "friendly": "Not true, sorry!"},
+        }
+    if "VERIFIER" in system_prompt:
+        return {
+            "stance": "unclear", "key_points": ["Sources do not support the claim"],
+            "evidence_for": [], "questions_for_skeptic": [], "confidence_support": 20,
+        }
+    if "SKEPTIC" in system_prompt:
+        return {
+            "stance": "refute", "key_points": ["Authoritative sources contradict the claim"],
+            "evidence_against": [{"title": "Fact check", "url": "https://example.org/fc", "snippet": "False.", "refutes": "Direct refutation"}],
+            "questions_for_verifier": [], "confidence_refute": 85, "risk_flags": ["health"],
+        }
+    return {
+        "verdict": "false", "confidence": 86, "risk_level": "high", "topic": "health",
+        "why_bullets": ["Reputable sources refute the claim"], "uncertainties": [],
+        "debate_transcript": [{"agent": "moderator", "message": "Refuted by reputable sources"}],
+        "reply_templates": {"neutral": "This is not accurate.", "firm_mod": "False claim.", "friendly": "Not true, sorry!"},
+    }
+
+
+def fake_openai_app(upstream: Upstream, token_ms: float, decisive_rate: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        await upstream.delay()
+        failure = upstream.fail()
+        if failure is not None:
+            return failure
+
+        messages = body.get("messages") or []
+        system_prompt = messages[0]["content"] if messages else ""
+        content = json.dumps(_agent_output(system_prompt, upstream.rnd.random() < decisive_rate))
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body.get("model", "bench")}
+
+        if not body.get("stream"):
+            return {
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def chunks():
+            for i in range(0, len(content), 16):
+                delta = {"index": 0, "delta": {"content": content[i:i + 16]}, "finish_reason": None}
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [delta]})}\n\n"
+                await asyncio.sleep(token_ms / 1000)
+            done = {"index": 0, "delta": {}, "finish_reason": "stop"}
+            yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [done]})}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+async def _serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", lifespan="off"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.02)
+    return server
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"app exited early with code {proc.returncode}")
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("app did not become ready")
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def drive(url: str, claims: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    rnd = random.Random(args.seed)
+    workload = [rnd.choice(claims) for _ in range(args.requests)]
+    latencies: List[float] = []
+    # Stream endpoint only: until the verdict (early verdict event, or the result on a memory hit)
+    to_verdict: List[float] = []
+    by_urgency: Dict[str, List[float]] = {"low": [], "medium": [], "high": []}
+    statuses: Dict[int, int] = {}
+    memory_hits = 0
+    tiers: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for claim in workload:
+        queue.put_nowait(claim)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120.0, limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal memory_hits
+            while not queue.empty():
+                claim = queue.get_nowait()
+                urgency = rnd.choice(["low", "medium", "high"])
+                payload = {"claim": claim, "context": {"source": "social", "urgency_hint": urgency}}
+                start = time.perf_counter()
+                try:
+                    if args.endpoint == "stream":
+                        async with client.stream("POST", "/analyze/stream", json=payload) as resp:
+                            last, verdict_ms = "", None
+                            async for line in resp.aiter_lines():
+                                if verdict_ms is None and line in ("event: verdict", "event: result"):
+                                    verdict_ms = (time.perf_counter() - start) * 1000
+                                if line.startswith("data: "):
+                                    last = line[6:]
+                            if verdict_ms is not None:
+                                to_verdict.append(verdict_ms)
+                            status = resp.status_code
+                            data = json.loads(last) if last else {}
+                    else:
+                        resp = await client.post("/analyze", json=payload)
+                        status = resp.status_code
+                        data = resp.json() if status == 200 else {}
+                except httpx.HTTPError:
+                    status, data = 0, {}
+                latencies.append((time.perf_counter() - start) * 1000)
+                if status == 200:
+                    by_urgency[urgency].append(latencies[-1])
+                statuses[status] = statuses.get(status, 0) + 1
+                if (data.get("memory") or {}).get("hit"):
+                    memory_hits += 1
+                elif status == 200:
+                    tier = str((data.get("meta") or {}).get("debate_tier"))
+                    tiers[tier] = tiers.get(tier, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+        health = (await client.get("/health")).json()
+
+    latencies.sort()
+    to_verdict.sort()
+    for values in by_urgency.values():
+        values.sort()
+    return {
+        "requests": len(workload),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(workload) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 1),
+            "p95": round(_percentile(latencies, 95), 1),
+            "p99": round(_percentile(latencies, 99), 1),
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+            "max": round(latencies[-1], 1) if latencies else 0.0,
+        },
+        "time_to_verdict_ms": {
+            "p50": round(_percentile(to_verdict, 50), 1),
+            "p99": round(_percentile(to_verdict, 99), 1),
+        } if to_verdict else None,
+        "latency_by_urgency_ms": {
+            urgency: {"p50": round(_percentile(values, 50), 1), "p99": round(_percentile(values, 99), 1)}
+            for urgency, values in by_urgency.items()
+        },
+        "statuses": statuses,
+        "memory_hit_rate": round(memory_hits / len(workload), 4) if workload else 0.0,
+        "debate_tiers": tiers,
+        "caches": {k: health.get(k) for k in ("memory_cache", "search_cache", "llm_cache", "pipelines")},
+        "scheduler": health.get("scheduler"),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    you_up = Upstream(args.search_latency_ms, args.jitter_ms, args.search_error_rate, args.seed)
+    llm_up = Upstream(args.llm_latency_ms, args.jitter_ms, args.llm_error_rate, args.seed + 1)
+    you_port, llm_port, app_port = _free_port(), _free_port(), _free_port()
+    you_server = await _serve(fake_you_app(you_up), you_port)
+    llm_server = await _serve(fake_openai_app(llm_up, args.token_ms, args.triage_decisive_rate), llm_port)
+
+    workdir = tempfile.mkdtemp(prefix="debateshield-bench-")
+    env = {
+        **os.environ,
+        "APP_ENV": "bench",
+        "DATABASE_PATH": os.path.join(workdir, "bench.db"),
+        "YOU_API_KEY": "bench",
+        "YOU_SEARCH_URL": f"http://127.0.0.1:{you_port}/v1/search",
+        "LLM_API_KEY": "bench",
+        "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        # Several workers share the search cache through SQLite, as in production
+        "SEARCH_CACHE_PATH": os.path.join(workdir, "search_cache.db") if args.workers > 1 else "",
+        "WEB_CONCURRENCY": str(args.workers),
+    }
+    log = open(os.path.join(workdir, "app.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(url, proc)
+        report = await drive(url, make_claims(args.unique_claims, args.seed), args)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        you_server.should_exit = True
+        llm_server.should_exit = True
+
+    report["upstream"] = {
+        "search_calls": you_up.calls, "search_errors_injected": you_up.errors,
+        "llm_calls": llm_up.calls, "llm_errors_injected": llm_up.errors,
+    }
+    report["app_log"] = os.path.join(workdir, "app.log")
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    lat = report["latency_ms"]
+    print("=" * 60)
+    print("DebateShield Lite - Benchmark")
+    print("=" * 60)
+    print(f"Requests:     {report['requests']} @ concurrency {report['concurrency']}")
+    print(f"Elapsed:      {report['elapsed_s']} s  ({report['throughput_rps']} req/s)")
+    print(f"Latency (ms): p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  mean={lat['mean']}  max={lat['max']}")
+    for urgency, lat_u in report["latency_by_urgency_ms"].items():
+        print(f"  {urgency:<7} (200s) p50={lat_u['p50']}  p99={lat_u['p99']}")
+    if report["time_to_verdict_ms"]:
+        ttv = report["time_to_verdict_ms"]
+        print(f"To verdict:   p50={ttv['p50']}  p99={ttv['p99']}  (ms, stream endpoint)")
+    print(f"Statuses:     {report['statuses']}")
+    print(f"Memory hits:  {report['memory_hit_rate']:.1%} of requests")
+    print(f"Debate tiers: {report['debate_tiers']} (non-memory responses)")
+    for name, stats in report["caches"].items():
+        print(f"{name + ':':14}{stats}")
+    print(f"Upstream:     {report['upstream']}")
+    print(f"App log:      {report['app_log']}")
+    print("=" * 60)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Offline load test for DebateShield Lite")
+    p.add_argument("--requests", type=int, default=200, help="total /analyze calls")
+    p.add_argument("--concurrency", type=int, default=10, help="concurrent clients")
+    p.add_argument("--unique-claims", type=int, default=50, help="size of the claim pool (smaller = more repeats)")
+    p.add_argument("--endpoint", choices=["analyze", "stream"], default="analyze")
+    p.add_argument("--search-latency-ms", type=float, default=300)
+    p.add_argument("--llm-latency-ms", type=float, default=800)
+    p.add_argument("--token-ms", type=float, default=5, help="delay between streamed LLM chunks")
+    p.add_argument("--jitter-ms", type=float, default=50)
+    p.add_argument("--triage-decisive-rate", type=float, default=0.5,
+                   help="share of triage calls the fake LLM marks decisive")
+    p.add_argument("--search-error-rate", type=float, default=0.0)
+    p.add_argument("--llm-error-rate", type=float, default=0.0)
+    p.add_argument("--workers", type=int, default=1, help="app worker processes")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
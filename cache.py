@@ -0,0 +1,167 @@
+"""In-process caches and their optional SQLite backing"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+import aiosqlite
+
+import jsonutil
+
+
+class TTLCache:
+    """
+    Size-bounded LRU where every entry carries its own TTL.
+    Expired entries are dropped lazily on access; when full, the least
+    recently used entry is evicted. `on_evict(key, value)`, if given, is
+    called for every value that leaves the cache (evicted, expired, popped,
+    replaced or cleared), so callers can keep side indexes in step.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            if self._on_evict is not None:
+                self._on_evict(key, value)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        old = self._data.get(key)
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+        if self._on_evict is not None and old is not None:
+            self._on_evict(key, old[1])
+        while len(self._data) > self.maxsize:
+            evicted, (_, evicted_value) = self._data.popitem(last=False)
+            if self._on_evict is not None:
+                self._on_evict(evicted, evicted_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        if self._on_evict is not None:
+            self._on_evict(key, entry[1])
+        return entry[1]
+
+    def clear(self) -> None:
+        entries = list(self._data.items()) if self._on_evict is not None else []
+        self._data.clear()
+        for key, (_, value) in entries:
+            self._on_evict(key, value)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Snapshot of live (key, value) pairs, least recently used first"""
+        now = self._clock()
+        return iter([(k, v) for k, (exp, v) in self._data.items() if exp > now])
+
+
+class SQLiteStore:
+    """
+    Persistent key/value table for cache layers that should survive restarts.
+    Values are stored as JSON with two wall-clock deadlines: `fresh_until`
+    (serve as-is) and `expires_at` (drop). Callers decide what to do with
+    entries in between (e.g. serve stale and revalidate).
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int = 0):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries  # 0 = unbounded
+        self._db: Optional[aiosqlite.Connection] = None
+        self._open_lock = asyncio.Lock()
+        self._writes = 0
+
+    async def _conn(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        # One connection per process, even if the first requests arrive together
+        async with self._open_lock:
+            if self._db is not None:
+                return self._db
+            db = aiosqlite.connect(self.path)
+            db.daemon = True
+            await db
+            # Before anything else: other worker processes may be opening the same file
+            await db.execute("PRAGMA busy_timeout = 5000")
+            async with db.execute("PRAGMA journal_mode = WAL") as cursor:
+                await cursor.fetchall()
+            await db.execute("PRAGMA synchronous = NORMAL")
+            await db.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    fresh_until REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            await db.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_expires ON {self.table}(expires_at)"
+            )
+            # Entries past their hard expiry are never served; reclaim them on open
+            await db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            await db.commit()
+            self._db = db
+        return self._db
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """(value, fresh_until, expires_at) for a live entry, else None"""
+        db = await self._conn()
+        async with db.execute(
+            f"SELECT value, fresh_until, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return jsonutil.loads(row[0]), row[1], row[2]
+
+    async def set(self, key: str, value: Any, fresh_until: float, expires_at: float) -> None:
+        db = await self._conn()
+        await db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, fresh_until, expires_at) VALUES (?, ?, ?, ?)",
+            (key, jsonutil.dumps(value), fresh_until, expires_at)
+        )
+        self._writes += 1
+        # Trim periodically rather than per write; soonest-expiring rows go first
+        if self.max_entries and self._writes % 100 == 0:
+            await db.execute(f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY expires_at
+                    LIMIT max(0, (SELECT COUNT(*) FROM {self.table}) - ?)
+                )
+            """, (self.max_entries,))
+        await db.commit()
+
+    async def count(self) -> int:
+        db = await self._conn()
+        async with db.execute(f"SELECT COUNT(*) FROM {self.table}") as cursor:
+            row = await cursor.fetchone()
+        return row[0]
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
@@ -0,0 +1,62 @@
+"""MinHash/LSH candidate index for near-duplicate claim lookup
+
+Each normalized claim is shingled into character n-grams and summarized by a
+MinHash signature. The signature is cut into bands; every band hashes to one
+bucket key stored in the ``claim_lsh`` table. Claims sharing at least one
+bucket are candidates, and only those are scored with fuzz.ratio.
+"""
+import hashlib
+import struct
+from typing import List, Set
+
+NGRAM_SIZE = 3
+BANDS = 20
+ROWS_PER_BAND = 3
+NUM_PERM = BANDS * ROWS_PER_BAND
+
+# Each shingle is hashed once into NUM_PERM independent 32-bit values by
+# slicing keyed blake2b digests; the signature is the column-wise minimum.
+_WORDS_PER_DIGEST = 16  # 64-byte digest / 4 bytes
+_DIGEST_KEYS = [
+    f"claim-lsh-{i}".encode()
+    for i in range(-(-NUM_PERM // _WORDS_PER_DIGEST))
+]
+_UNPACK = struct.Struct(f"<{_WORDS_PER_DIGEST}I").unpack
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _shingle_hashes(shingle: bytes) -> List[int]:
+    values: List[int] = []
+    for key in _DIGEST_KEYS:
+        values.extend(_UNPACK(hashlib.blake2b(shingle, key=key).digest()))
+    return values[:NUM_PERM]
+
+
+def shingles(normalized: str) -> Set[str]:
+    """Character n-grams of a normalized claim (padded so short claims still shingle)"""
+    padded = f" {normalized} "
+    if len(padded) <= NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def signature(normalized: str) -> List[int]:
+    """MinHash signature over the claim's shingles"""
+    rows = [_shingle_hashes(s.encode()) for s in shingles(normalized)]
+    return [min(column) for column in zip(*rows)]
+
+
+def bucket_keys(normalized: str) -> List[int]:
+    """One signed 64-bit bucket key per LSH band (band index is mixed into the key)"""
+    sig = signature(normalized)
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        raw = band.to_bytes(2, "little") + b"".join(r.to_bytes(4, "little") for r in rows)
+        key = _hash64(raw)
+        # SQLite INTEGER is signed 64-bit
+        keys.append(key - (1 << 64) if key >= (1 << 63) else key)
+    return keys
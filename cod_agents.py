@@ -1,33 +1,319 @@
 """Chain-of-Debate agents: Verifier, Skeptic, Moderator"""
-import json
-from typing import Dict, Any, List
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Dict, Any, List, Optional, Awaitable, Callable
 from openai import AsyncOpenAI
+import jsonutil
 from config import config
+from jsonstream import FieldScanner
+from llm_cache import make_llm_cache
+from metrics import record_tokens, stage
+from outbound import CircuitBreaker, OutboundPolicy
+from scheduler import PriorityLimiter
+
+# Streaming callbacks
+TokenCallback = Callable[[str], Awaitable[None]]
+FieldCallback = Callable[[str, Any], Awaitable[None]]
+EventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Rough prompt-token estimate for English text
+CHARS_PER_TOKEN = 4
+
+# Debater fields the Moderator actually adjudicates on
+MODERATOR_FIELDS = (
+    "stance", "key_points", "confidence_support", "confidence_refute", "risk_flags", "error"
+)
+
+
+# What an agent's output must contain to be cached; anything less is asked for again next time
+REQUIRED_FIELDS = {
+    "triage": ("decisive", "verdict", "confidence"),
+    "verifier": ("stance",),
+    "skeptic": ("stance",),
+    "moderator": ("verdict", "confidence"),
+}
+VERDICTS = ("true", "false", "mixed", "uncertain")
+
+
+def is_complete(agent: str, output: Any) -> bool:
+    """True if output is a dict with the agent's required fields (and a known verdict, if any)"""
+    if not isinstance(output, dict):
+        return False
+    if any(output.get(key) is None for key in REQUIRED_FIELDS.get(agent, ())):
+        return False
+    return "verdict" not in output or output["verdict"] in VERDICTS
+
+
+def fallback_verdict(reason: str) -> Dict[str, Any]:
+    """Conservative uncertain verdict for when the debate cannot produce one"""
+    return {
+        "verdict": "uncertain",
+        "confidence": 20,
+        "risk_level": "medium",
+        "topic": "general",
+        "why_bullets": ["CoD pipeline failed; returning conservative uncertainty."],
+        "uncertainties": [reason],
+        "debate_transcript": [
+            {"agent": "moderator", "message": "Fallback uncertain verdict due to error."}
+        ],
+        "reply_templates": {
+            "neutral": "I’m not fully sure this is accurate—worth checking reliable sources before sharing.",
+            "firm_mod": "We can’t verify this claim with reliable evidence right now.",
+            "friendly": "Not sure this is true—maybe double-check before reposting.",
+        },
+    }
+
+
+def _compact(data: Any) -> str:
+    """Whitespace-free JSON for prompts"""
+    return jsonutil.dumps(data)
+
+
+def _clip(text: str, limit: int) -> str:
+    """text cut (with an ellipsis) so its JSON-escaped form is at most limit characters"""
+    if len(_compact(text)) - 2 <= limit:
+        return text
+    used = 0
+    for i, char in enumerate(text):
+        # Quotes, backslashes and control characters grow when escaped
+        used += len(_compact(char)) - 2
+        if used > limit - 1:
+            return text[:i].rstrip() + "…"
+    return text
+
+
+def pack_evidence(search_results: List[Dict[str, Any]], token_budget: int) -> str:
+    """
+    Serialize search results for an agent prompt: drop repeated URLs and
+    empty items, then trim snippets so the whole block fits token_budget.
+    """
+    seen = set()
+    items = []
+    for r in search_results:
+        title = (r.get("title") or "").strip()
+        url = (r.get("url") or "").strip()
+        snippet = " ".join((r.get("snippet") or "").split())
+        key = url or title
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        items.append({"title": title, "url": url, "snippet": snippet})
+    
+    if items:
+        # Whatever the titles/urls/keys leave is split evenly between snippets
+        fixed = len(_compact([{**item, "snippet": ""} for item in items]))
+        per_snippet = max(80, (token_budget * CHARS_PER_TOKEN - fixed) // len(items))
+        for item in items:
+            item["snippet"] = _clip(item["snippet"], per_snippet)
+    return _compact(items)
+
+
+def brief_for_moderator(output: Dict[str, Any]) -> str:
+    """Only the debater fields the Moderator needs (no evidence lists or questions)"""
+    return _compact({k: output[k] for k in MODERATOR_FIELDS if k in output})
+
 
 class CoD_Agents:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=config.LLM_API_KEY)
+        # Retries are handled by self.outbound (rate limit, Retry-After, circuit breaker)
+        self.client = AsyncOpenAI(
+            api_key=config.LLM_API_KEY, base_url=config.LLM_BASE_URL or None, max_retries=0
+        )
+        self.outbound = OutboundPolicy(
+            "llm",
+            rate=config.LLM_RATE_PER_S,
+            burst=config.LLM_BURST,
+            max_retries=config.OUTBOUND_MAX_RETRIES,
+            backoff_base=config.OUTBOUND_BACKOFF_BASE_S,
+            backoff_max=config.OUTBOUND_BACKOFF_MAX_S,
+            breaker=CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET_S),
+        )
         self.model = config.LLM_MODEL
+        self.agent_timeout = config.AGENT_TIMEOUT_S
+        self.concurrent = config.DEBATE_CONCURRENT
+        self.limiter = PriorityLimiter(config.LLM_CONCURRENCY)
+        self.tiered = config.DEBATE_TIERED
+        self.triage_min_confidence = config.TRIAGE_MIN_CONFIDENCE
+        self.temperature = 0.7
+        self.evidence_token_budget = config.EVIDENCE_TOKEN_BUDGET
+        self.cache = make_llm_cache(
+            config.LLM_CACHE_BACKEND,
+            max_entries=config.LLM_CACHE_SIZE,
+            ttl=config.LLM_CACHE_TTL_S,
+            path=config.LLM_CACHE_PATH
+        )
+    
+    async def aclose(self):
+        if self.cache is not None:
+            await self.cache.close()
+    
+    async def _run_agent(self, name: str, call: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Await one agent under the per-agent timeout; a timeout yields an error stub"""
+        try:
+            return await asyncio.wait_for(call, timeout=self.agent_timeout)
+        except asyncio.TimeoutError:
+            print(f"{name} agent timed out after {self.agent_timeout}s")
+            return {"stance": "unclear", "error": f"{name} timed out after {self.agent_timeout}s"}
+    
+    async def _call_llm(
+        self,
+        agent: str,
+        system_prompt: str,
+        user_message: str,
+        on_token: Optional[TokenCallback] = None,
+        on_field: Optional[FieldCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Call LLM and parse JSON response. Streams if either callback is given:
+        content deltas go to on_token, and each top-level field goes to
+        on_field as soon as its value is complete.
+        """
+        with stage(f"agent.{agent}"):
+            return await self._complete(agent, system_prompt, user_message, on_token, on_field)
     
-    async def _call_llm(self, system_prompt: str, user_message: str) -> Dict[str, Any]:
-        """Call LLM and parse JSON response"""
+    async def _complete(
+        self,
+        agent: str,
+        system_prompt: str,
+        user_message: str,
+        on_token: Optional[TokenCallback],
+        on_field: Optional[FieldCallback]
+    ) -> Dict[str, Any]:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(system_prompt, user_message, self.model, self.temperature)
+            cached = await self.cache.get(cache_key)
+            if cached is not None and is_complete(agent, cached):
+                if on_token is not None:
+                    await on_token(_compact(cached))
+                if on_field is not None:
+                    for key, value in cached.items():
+                        await on_field(key, value)
+                return cached
+        
         try:
-            response = await self.client.chat.completions.create(
+            request = dict(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_message}
                 ],
-                temperature=0.7,
+                temperature=self.temperature,
                 response_format={"type": "json_object"}
             )
             
-            content = response.choices[0].message.content
-            return json.loads(content)
+            usage = None
+            # Global cap on upstream calls; urgent requests get freed slots first. Each
+            # attempt takes its own slot, so retry backoff does not hold one.
+            if on_token is None and on_field is None:
+                async def create():
+                    async with self.limiter.slot():
+                        return await self.client.chat.completions.create(**request)
+                response = await self.outbound.call(create)
+                content = response.choices[0].message.content
+                usage = response.usage
+            else:
+                async def open_stream():
+                    # The slot stays held while the opened stream is read
+                    held = AsyncExitStack()
+                    await held.enter_async_context(self.limiter.slot())
+                    try:
+                        return held, await self.client.chat.completions.create(
+                            **request, stream=True, stream_options={"include_usage": True}
+                        )
+                    except BaseException:
+                        await held.aclose()
+                        raise
+                # Only opening the stream is retried; nothing has reached the callbacks yet
+                held, stream = await self.outbound.call(open_stream)
+                async with held:
+                    parts = []
+                    scanner = FieldScanner() if on_field is not None else None
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            if on_token is not None:
+                                await on_token(delta)
+                            if scanner is not None:
+                                for key, value in scanner.feed(delta):
+                                    await on_field(key, value)
+                        # Usage arrives on the final chunk (with no choices)
+                        usage = getattr(chunk, "usage", None) or usage
+                    content = "".join(parts)
+            
+            if usage is not None:
+                record_tokens(agent, usage.prompt_tokens, usage.completion_tokens)
+            
+            result = jsonutil.loads(content)
         
         except Exception as e:
             print(f"LLM call error: {e}")
             return {"error": str(e)}
+        
+        if cache_key is not None:
+            if is_complete(agent, result):
+                await self.cache.set(cache_key, result)
+            else:
+                print(f"{agent} output is missing required fields; not cached")
+        return result
+    
+    async def triage_agent(
+        self,
+        claim: str,
+        search_results: List[Dict[str, Any]],
+        on_field: Optional[FieldCallback] = None
+    ) -> Dict[str, Any]:
+        """Triage agent: one-pass verdict, flagged decisive only when the evidence clearly settles the claim"""
+        system_prompt = """You are the TRIAGE agent in a Chain-of-Debate system.
+
+Goal: Decide from the provided search results alone whether this claim is clearly settled, and if so, give the final verdict in one pass. Contested or thin evidence goes to a full multi-agent debate.
+
+Output STRICT JSON with this structure:
+{
+  "decisive": true,
+  "verdict": "true|false|mixed|uncertain",
+  "confidence": 90,
+  "risk_level": "low|medium|high",
+  "topic": "health|finance|emergency|politics|general",
+  "why_bullets": ["Reason 1 for verdict", "Reason 2 for verdict"],
+  "uncertainties": [],
+  "evidence_for": [{"title": "...", "url": "...", "snippet": "..."}],
+  "evidence_against": [{"title": "...", "url": "...", "snippet": "..."}],
+  "debate_transcript": [{"agent": "triage", "message": "Why the evidence is (or is not) decisive"}],
+  "reply_templates": {
+    "neutral": "Brief neutral response",
+    "firm_mod": "Firm moderation response",
+    "friendly": "Friendly educational response"
+  }
+}
+
+Rules:
+- decisive = true ONLY if multiple reputable sources agree and none credibly contradict them
+- Any credible disagreement, missing context, or weak sources → decisive = false
+- Use only information from provided search results; do not invent facts
+- Risk: health/emergency → high; finance/scam → medium or high; politics → low or medium"""
+
+        user_message = f"""Claim: {claim}
+
+Search Results:
+{pack_evidence(search_results, self.evidence_token_budget)}
+
+Provide your JSON response."""
+
+        return await self._call_llm("triage", system_prompt, user_message, on_field=on_field)
+    
+    def _is_decisive(self, triage_output: Dict[str, Any]) -> bool:
+        """Only confident true/false triage verdicts skip the full debate"""
+        try:
+            confidence = int(triage_output.get("confidence") or 0)
+        except (TypeError, ValueError):
+            return False
+        return (
+            triage_output.get("decisive") is True
+            and triage_output.get("verdict") in ("true", "false")
+            and confidence >= self.triage_min_confidence
+        )
     
     async def verifier_agent(self, claim: str, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Verifier agent argues the claim could be true"""
@@ -56,11 +342,11 @@ Rules:
         user_message = f"""Claim: {claim}
 
 Search Results:
-{json.dumps(search_results, indent=2)}
+{pack_evidence(search_results, self.evidence_token_budget)}
 
 Analyze and provide your JSON response."""
 
-        return await self._call_llm(system_prompt, user_message)
+        return await self._call_llm("verifier", system_prompt, user_message)
     
     async def skeptic_agent(self, claim: str, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Skeptic agent argues the claim is false or misleading"""
@@ -90,17 +376,19 @@ Rules:
         user_message = f"""Claim: {claim}
 
 Search Results:
-{json.dumps(search_results, indent=2)}
+{pack_evidence(search_results, self.evidence_token_budget)}
 
 Analyze and provide your JSON response."""
 
-        return await self._call_llm(system_prompt, user_message)
+        return await self._call_llm("skeptic", system_prompt, user_message)
     
     async def moderator_agent(
         self, 
         claim: str, 
         verifier_output: Dict[str, Any],
-        skeptic_output: Dict[str, Any]
+        skeptic_output: Dict[str, Any],
+        on_token: Optional[TokenCallback] = None,
+        on_field: Optional[FieldCallback] = None
     ) -> Dict[str, Any]:
         """Moderator adjudicates and produces final verdict"""
         system_prompt = """You are the MODERATOR agent in a Chain-of-Debate system.
@@ -138,6 +426,7 @@ Decision rules:
 - Both sides have merit → mixed
 - Weak/conflicting evidence → uncertain
 - List specific uncertainties for mixed/uncertain
+- If an agent output only contains an "error", that side is missing: decide from the other side and lower confidence
 
 Risk assessment:
 - health/emergency → high
@@ -148,38 +437,113 @@ Risk assessment:
         user_message = f"""Claim: {claim}
 
 VERIFIER OUTPUT:
-{json.dumps(verifier_output, indent=2)}
+{brief_for_moderator(verifier_output)}
 
 SKEPTIC OUTPUT:
-{json.dumps(skeptic_output, indent=2)}
+{brief_for_moderator(skeptic_output)}
 
 Provide your final adjudication in JSON format."""
 
-        return await self._call_llm(system_prompt, user_message)
+        return await self._call_llm(
+            "moderator", system_prompt, user_message, on_token=on_token, on_field=on_field
+        )
     
     async def run_debate(
         self, 
         claim: str, 
-        evidence: Dict[str, List[Dict[str, Any]]]
+        evidence: Dict[str, List[Dict[str, Any]]],
+        concurrent: Optional[bool] = None,
+        on_event: Optional[EventCallback] = None,
+        tiered: Optional[bool] = None
     ) -> Dict[str, Any]:
-        """Run the full Chain-of-Debate process"""
-        # Verifier argues for the claim
-        verifier_output = await self.verifier_agent(claim, evidence["all"])
+        """
+        Run the Chain-of-Debate process.
+        
+        When tiered, a single Triage call runs first; a decisive triage verdict
+        is returned as-is (debate_tier "triage") and anything else escalates to
+        the full Verifier/Skeptic/Moderator debate (debate_tier "full").
         
-        # Skeptic argues against the claim
-        skeptic_output = await self.skeptic_agent(claim, evidence["all"])
+        on_event, if given, receives ("agent", {...}) as each agent finishes,
+        ("token", {...}) for every Moderator content delta, and ("verdict", {...})
+        once the deciding agent (a decisive Triage, else the Moderator) has
+        generated its verdict and confidence, before the rest of its output.
+        """
+        concurrent = self.concurrent if concurrent is None else concurrent
+        tiered = self.tiered if tiered is None else tiered
         
-        # Moderator adjudicates
-        moderator_output = await self.moderator_agent(claim, verifier_output, skeptic_output)
+        async def debater(name: str, call: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+            output = await self._run_agent(name, call)
+            if on_event is not None:
+                await on_event("agent", {"agent": name.lower(), "output": output})
+            return output
+        
+        def verdict_watch(agent: str, decides: Callable[[Dict[str, Any]], bool]) -> Optional[FieldCallback]:
+            """Field callback emitting the early verdict event, or None without on_event"""
+            if on_event is None:
+                return None
+            partial: Dict[str, Any] = {}
+            sent = False
+            
+            async def on_field(key: str, value: Any) -> None:
+                nonlocal sent
+                if sent:
+                    return
+                partial[key] = value
+                if "verdict" in partial and "confidence" in partial and decides(partial):
+                    sent = True
+                    await on_event("verdict", {
+                        "agent": agent, "verdict": partial["verdict"], "confidence": partial["confidence"]
+                    })
+            return on_field
+        
+        if tiered:
+            triage_output = await debater("Triage", self.triage_agent(
+                claim, evidence["all"], on_field=verdict_watch("triage", self._is_decisive)
+            ))
+            if self._is_decisive(triage_output):
+                return {**triage_output, "debate_tier": "triage"}
+        
+        async def moderator_token(text: str) -> None:
+            await on_event("token", {"agent": "moderator", "text": text})
+        
+        verifier_call = debater("Verifier", self.verifier_agent(claim, evidence["all"]))
+        skeptic_call = debater("Skeptic", self.skeptic_agent(claim, evidence["all"]))
+        
+        if concurrent:
+            # Verifier and Skeptic are independent; only the Moderator needs both
+            verifier_output, skeptic_output = await asyncio.gather(verifier_call, skeptic_call)
+        else:
+            verifier_output = await verifier_call
+            skeptic_output = await skeptic_call
+        
+        # Moderator adjudicates (with whatever arrived if one side failed)
+        moderator_output = await self._run_agent("Moderator", self.moderator_agent(
+            claim, verifier_output, skeptic_output,
+            on_token=moderator_token if on_event is not None else None,
+            on_field=verdict_watch("moderator", lambda partial: True)
+        ))
+        if "verdict" not in moderator_output:
+            # Timed out or failed: the same conservative verdict as a failed pipeline
+            moderator_output = fallback_verdict(moderator_output.get("error") or "Moderator returned no verdict")
         
         # Combine evidence from both agents
         evidence_for = verifier_output.get("evidence_for", [])
         evidence_against = skeptic_output.get("evidence_against", [])
         
+        # Record a partial debate so the verdict is not mistaken for a full one
+        missing = [
+            f"{name} agent unavailable ({output['error']}); verdict based on a partial debate."
+            for name, output in (("Verifier", verifier_output), ("Skeptic", skeptic_output))
+            if output.get("error")
+        ]
+        if missing:
+            moderator_output["uncertainties"] = list(moderator_output.get("uncertainties") or []) + missing
+        
         return {
             **moderator_output,
             "evidence_for": evidence_for,
             "evidence_against": evidence_against,
             "verifier_stance": verifier_output.get("stance"),
-            "skeptic_stance": skeptic_output.get("stance")
+            "skeptic_stance": skeptic_output.get("stance"),
+            "debate_tier": "full"
         }
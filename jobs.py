@@ -0,0 +1,253 @@
+"""Background job queue: claims analyzed by a worker pool, persisted in the app's database"""
+import asyncio
+import ipaddress
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+import jsonutil
+from memory import Memory
+from scheduler import priority_for
+from storage import DONE, FAILED, QUEUED
+
+Runner = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# Longest wait between worker retries after a storage error
+MAX_BACKOFF_S = 60.0
+
+
+async def check_callback_url(url: str) -> str:
+    """
+    Raise ValueError unless url is http(s) and every address its host resolves
+    to is public: not loopback, link-local, private, reserved, multicast or
+    unspecified (the server itself, cloud metadata endpoints, the internal
+    network), IPv4-mapped IPv6 included. Returns the address to deliver to.
+    Checked on submit and again before each delivery.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL with a host")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {parts.hostname!r} does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        # ::ffff:127.0.0.1 reaches 127.0.0.1
+        address = getattr(address, "ipv4_mapped", None) or address
+        if (
+            address.is_loopback or address.is_link_local or address.is_unspecified
+            or address.is_private or address.is_reserved or address.is_multicast
+        ):
+            raise ValueError(f"callback_url host {parts.hostname!r} is not allowed")
+    return infos[0][4][0].split("%", 1)[0]
+
+
+class JobQueue:
+    """
+    Jobs live in a `jobs` table next to the claims (in memory.storage), so a
+    restart picks up where the last process stopped. `workers` tasks claim the
+    oldest queued job of the highest priority, run it through `runner` and POST
+    the outcome to the job's callback_url. A running job holds a lease its
+    worker renews; if the process dies, the lease runs out and any worker
+    process sharing the database requeues the job.
+    """
+
+    def __init__(
+        self,
+        memory: Memory,
+        runner: Runner,
+        workers: int = 4,
+        poll_interval: float = 2.0,
+        retention: float = 7 * 86400,
+        callback_timeout: float = 10.0,
+        callback_attempts: int = 3,
+        lease: float = 60.0
+    ):
+        self.memory = memory
+        self.store = memory.storage
+        self.runner = runner
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = callback_attempts
+        self.lease = lease
+        self._running: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        # Callback deliveries run beside the workers, not on them
+        self._deliveries: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._busy = 0
+
+    async def init_db(self):
+        """Create the jobs table (call after Memory.init_db)"""
+        await self.store.init_jobs()
+
+    async def start(self):
+        """Purge old finished jobs and start the workers"""
+        if self._tasks:
+            return
+        await self.store.purge_jobs(time.time() - self.retention)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers, hand their unfinished jobs back to the queue, give pending callbacks a moment"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._deliveries:
+            _, pending = await asyncio.wait(self._deliveries, timeout=self.callback_timeout)
+            for task in pending:
+                task.cancel()
+        if self._running:
+            await self.store.requeue_jobs(sorted(self._running))
+            self._running.clear()
+
+    async def submit(
+        self, claim: str, context: Dict[str, Any], callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Persist a new job and wake a worker (ValueError for a disallowed callback_url)"""
+        if callback_url:
+            await check_callback_url(callback_url)
+        job = {
+            "id": uuid.uuid4().hex,
+            "claim": claim,
+            "context": context,
+            "priority": priority_for(context),
+            "status": QUEUED,
+            "callback_url": callback_url,
+            "created_at": time.time(),
+        }
+        await self.store.insert_job({**job, "context": jsonutil.dumps(context)})
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.store.get_job(job_id)
+        if job is None:
+            return None
+        for field in ("context", "result"):
+            if job[field]:
+                job[field] = jsonutil.loads(job[field])
+        return job
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await self.store.job_counts()
+        return {"workers": len(self._tasks), "busy": self._busy, **counts}
+
+    async def _claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the next queued job to 'running' (requeueing expired leases first)"""
+        requeued, row = await self.store.claim_job(time.time(), self.lease)
+        if requeued:
+            print(f"Job queue: requeued {requeued} job(s) with expired leases")
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "claim": row["claim"],
+            "context": jsonutil.loads(row["context"] or "{}"),
+            "callback_url": row["callback_url"],
+        }
+
+    async def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+        await self.store.finish_job(
+            job_id, status, jsonutil.dumps(result) if result is not None else None, error, time.time()
+        )
+
+    async def _worker(self):
+        failures = 0
+        while True:
+            try:
+                await self._work_once()
+                failures = 0
+            except Exception as e:
+                # A storage hiccup must not kill the worker; back off and poll again
+                failures += 1
+                delay = min(self.poll_interval * 2 ** (failures - 1), MAX_BACKOFF_S)
+                print(f"Job queue: worker error ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _work_once(self):
+        job = await self._claim_next()
+        if job is None:
+            # Sleep until a submit wakes us (or poll, in case another process queued work)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        self._busy += 1
+        self._running.add(job["id"])
+        heartbeat = asyncio.create_task(self._renew_lease(job["id"]))
+        try:
+            try:
+                result = await self.runner(job["claim"], job["context"])
+                status, error = DONE, None
+            except Exception as e:
+                result, status, error = None, FAILED, str(e) or type(e).__name__
+            await self._finish(job["id"], status, result, error)
+        finally:
+            # If _finish failed the lease lapses and another worker requeues the job
+            self._running.discard(job["id"])
+            heartbeat.cancel()
+            self._busy -= 1
+
+        if job["callback_url"]:
+            task = asyncio.create_task(self._deliver(job["id"], job["callback_url"], {
+                "job_id": job["id"], "status": status, "result": result, "error": error
+            }))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _renew_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.renew_job(job_id, time.time() + self.lease)
+            except Exception as e:
+                # Try again next beat; the lease only lapses after several misses
+                print(f"Job {job_id}: lease renewal failed ({type(e).__name__}: {e})")
+
+    async def _deliver(self, job_id: str, url: str, payload: Dict[str, Any]):
+        """POST the outcome to the callback URL, retrying with backoff; records the final status"""
+        outcome = "failed"
+        try:
+            # The host may resolve differently now than on submit
+            address = await check_callback_url(url)
+        except ValueError as e:
+            outcome = f"blocked: {e}"
+        else:
+            # Connect to the checked address, not the hostname: a second lookup
+            # could be rebound to an internal one. Host and TLS name stay the original.
+            target = httpx.URL(url)
+            pinned = target.copy_with(host=address)
+            headers = {"Host": target.netloc.decode("ascii")}
+            extensions = {"sni_hostname": target.host} if target.scheme == "https" else {}
+            async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+                for attempt in range(self.callback_attempts):
+                    try:
+                        response = await client.post(pinned, json=payload, headers=headers, extensions=extensions)
+                        outcome = str(response.status_code)
+                        if response.status_code < 500:
+                            break
+                    except httpx.HTTPError as e:
+                        outcome = f"error: {type(e).__name__}"
+                    if attempt + 1 < self.callback_attempts:
+                        await asyncio.sleep(2 ** attempt)
+
+        if not outcome.startswith("2"):
+            print(f"Job {job_id}: callback to {url} failed ({outcome})")
+        try:
+            await self.store.set_callback_status(job_id, outcome)
+        except Exception as e:
+            print(f"Job {job_id}: could not record callback status ({type(e).__name__}: {e})")
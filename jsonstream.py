@@ -0,0 +1,104 @@
+"""Incremental reading of a streamed JSON object, one top-level field at a time"""
+from typing import Any, List, Optional, Tuple
+
+import jsonutil
+
+_WHITESPACE = " \t\r\n"
+
+
+class FieldScanner:
+    """
+    Feed the text of a JSON object as it arrives; feed() returns the
+    top-level (key, value) pairs whose values closed in that chunk. Nested
+    values are returned whole once their closing bracket arrives, so e.g.
+    "verdict" is available while "reply_templates" is still generating.
+    Text before the opening brace (a code fence) and after the closing one
+    is ignored. The full text is still parsed by the caller at the end.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+        # At depth 1: "key", "colon", "value" (awaiting/reading one), "after"
+        self._state = "key"
+        self._key: Optional[str] = None
+        self._key_start = 0
+        self._value_start: Optional[int] = None
+        self._scalar = False
+
+    def _close(self, end: int, fields: List[Tuple[str, Any]]) -> None:
+        try:
+            fields.append((self._key, jsonutil.loads(self._text[self._value_start:end])))
+        except ValueError:
+            # Malformed value; the final parse of the whole text reports it
+            pass
+        self._value_start = None
+        self._scalar = False
+        self._state = "after"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        fields: List[Tuple[str, Any]] = []
+        if self._done:
+            return fields
+        self._text += chunk
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._state == "key":
+                            self._key = jsonutil.loads(text[self._key_start:i + 1])
+                            self._state = "colon"
+                        elif self._state == "value":
+                            self._close(i + 1, fields)
+                continue
+
+            if self._depth == 1 and self._scalar and (c in _WHITESPACE or c in ",}"):
+                self._close(i, fields)
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == "key":
+                        self._key_start = i
+                    elif self._state == "value":
+                        self._value_start = i
+            elif c in "{[":
+                if self._depth == 0:
+                    if c == "{":
+                        self._depth = 1
+                        self._state = "key"
+                    continue
+                if self._depth == 1 and self._state == "value":
+                    self._value_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:
+                    continue
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._close(i + 1, fields)
+                elif self._depth == 0:
+                    self._done = True
+                    break
+            elif self._depth == 1:
+                if c == ":" and self._state == "colon":
+                    self._state = "value"
+                elif c == ",":
+                    self._state = "key"
+                elif self._state == "value" and self._value_start is None and c not in _WHITESPACE:
+                    # Number, true, false or null: closes at the next delimiter
+                    self._value_start = i
+                    self._scalar = True
+        self._pos = len(text)
+        return fields
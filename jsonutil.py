@@ -0,0 +1,75 @@
+"""JSON encoding for responses, prompts and stored payloads: orjson when installed, stdlib otherwise"""
+import datetime
+import json
+import math
+import uuid
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+# Non-string dict keys become strings, as with the stdlib
+_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _plain(obj: Any) -> Any:
+    """What orjson writes natively, in stdlib terms: ISO dates, UUID strings, null for NaN/inf"""
+    if isinstance(obj, dict):
+        return {_plain(key): _plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(value) for value in obj]
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    return obj
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    try:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+    except (TypeError, ValueError):
+        # Only payloads json cannot write as is pay for the walk
+        return json.dumps(_plain(obj), separators=(",", ":"), ensure_ascii=False)
+
+
+def dumpb(obj: Any) -> bytes:
+    """Compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_OPTIONS)
+        except TypeError:
+            # orjson rejects ints beyond 64 bits; the stdlib does not
+            pass
+    return _stdlib_dumps(obj).encode()
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text (non-ASCII kept as is)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_OPTIONS).decode()
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through dumpb"""
+
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
@@ -0,0 +1,107 @@
+"""Content-addressed cache for agent (LLM) outputs"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+import jsonutil
+from cache import SQLiteStore, TTLCache
+
+
+class MemoryBackend:
+    """Process-local LRU; values kept as JSON so callers always get a fresh copy"""
+
+    def __init__(self, max_entries: int):
+        self._cache = TTLCache(max_entries)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._cache.get(key)
+        return None if raw is None else jsonutil.loads(raw)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._cache.set(key, jsonutil.dumpb(value), ttl=ttl)
+
+    async def size(self) -> int:
+        return len(self._cache)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class SQLiteBackend:
+    """Persistent, shared by every process pointing at the same file"""
+
+    def __init__(self, path: str, max_entries: int):
+        self._store = SQLiteStore(path, "llm_cache", max_entries=max_entries)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = await self._store.get(key)
+        return None if entry is None else entry[0]
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        expires_at = time.time() + ttl
+        await self._store.set(key, value, expires_at, expires_at)
+
+    async def size(self) -> int:
+        return await self._store.count()
+
+    async def close(self) -> None:
+        await self._store.close()
+
+
+class LLMCache:
+    """
+    Caches parsed agent outputs under a hash of everything that determines
+    the completion: system prompt, user message, model and temperature.
+    """
+
+    def __init__(self, backend: Any, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(system_prompt: str, user_message: str, model: str, temperature: float) -> str:
+        material = json.dumps([system_prompt, user_message, model, temperature])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            print(f"LLM cache read error: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            print(f"LLM cache write error: {e}")
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": await self.backend.size(),
+        }
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def make_llm_cache(backend: str, max_entries: int, ttl: float, path: str) -> Optional[LLMCache]:
+    """Build the configured cache; backend is "memory", "sqlite" or "off" """
+    if backend == "memory":
+        return LLMCache(MemoryBackend(max_entries), ttl)
+    if backend == "sqlite":
+        return LLMCache(SQLiteBackend(path, max_entries), ttl)
+    return None
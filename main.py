@@ -5,7 +5,7 @@ DebateShield Lite - FastAPI entrypoint (MATCHES CURRENT REPO)
 This main.py is aligned with your actual codebase:
 - cod_agents.py exports: CoD_Agents with .run_debate(...)
 - you_search.py exports: YouSearcher with .search(...)
-- memory.py exports: Memory with .init_db(), .find_similar_claim(), .store_claim()
+- memory.py exports: Memory with .init_db(), .get_cached_verdict(), .store_claim()
 - integrations.py exports: ActionEngine with .execute_actions()
 
 It also serves index.html from project root (no hard-coded /home/claude paths).
@@ -13,31 +13,71 @@ It also serves index.html from project root (no hard-coded /home/claude paths).
 
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-from typing import Any, Dict, Optional, List
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, List, Set
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
+from fuzzywuzzy import fuzz
 from pydantic import BaseModel, Field
 
+from assets import StaticAsset
 from config import config
+from jsonutil import FastJSONResponse
 from memory import Memory
+from storage import make_storage
 from you_search import YouSearcher
-from cod_agents import CoD_Agents
+from cod_agents import CoD_Agents, fallback_verdict
 from integrations import ActionEngine
+from jobs import JobQueue
+import jsonutil
+import metrics
+import scheduler
+import semantic
+from singleflight import SingleFlight
 
 APP_TITLE = "DebateShield Lite"
 APP_VERSION = "0.1.0"
 
-app = FastAPI(title=APP_TITLE, version=APP_VERSION)
+# Plain dict returns (e.g. /health) are rendered with the fast encoder too
+app = FastAPI(title=APP_TITLE, version=APP_VERSION, default_response_class=FastJSONResponse)
 
 # Singletons
-memory = Memory(config.DATABASE_PATH)
+memory = Memory(
+    storage=make_storage(
+        config.DATABASE_URL,
+        config.DATABASE_PATH,
+        read_pool_size=config.DB_READ_POOL_SIZE,
+        pool_size=config.DB_POOL_SIZE,
+    ),
+    hot_cache_size=config.VERDICT_CACHE_SIZE,
+    negative_ttl=config.CACHE_NEGATIVE_TTL_S,
+    semantic_match=config.SEMANTIC_MATCH,
+    semantic_threshold=config.SEMANTIC_THRESHOLD,
+    semantic_top_k=config.SEMANTIC_TOP_K,
+    semantic_max_vectors=config.SEMANTIC_MAX_VECTORS,
+)
 you = YouSearcher()
 cod = CoD_Agents()
 actions = ActionEngine()
 
+# Pipeline event callback: (event name, JSON-able payload)
+Emit = Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]]
+
+# Keeps fire-and-forget tasks referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+# In-flight pipelines keyed by Memory.hash_claim (thundering-herd protection)
+_pipelines: SingleFlight[Dict[str, Any]] = SingleFlight()
+
+# Admission for pipelines that miss memory: high urgency first, low urgency shed when backed up
+_admission = scheduler.PriorityLimiter(
+    config.PIPELINE_CONCURRENCY,
+    max_waiting={scheduler.PRIORITIES["low"]: config.SCHED_LOW_MAX_QUEUED},
+)
+
 
 # -------------------------
 # Models
@@ -53,6 +93,19 @@ class AnalyzeRequest(BaseModel):
     context: Optional[AnalyzeContext] = None
 
 
+class JobRequest(AnalyzeRequest):
+    callback_url: Optional[str] = Field(
+        default=None, pattern=r"^https?://", description="POSTed the job outcome when it finishes"
+    )
+
+
+class BatchAnalyzeRequest(BaseModel):
+    claims: List[Annotated[str, Field(min_length=3)]] = Field(
+        ..., min_length=1, max_length=config.BATCH_MAX_CLAIMS
+    )
+    context: Optional[AnalyzeContext] = None
+
+
 # -------------------------
 # Helpers
 # -------------------------
@@ -60,20 +113,15 @@ def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-def _read_ui() -> str:
-    candidates = [
+# The UI is read and compressed once; GET / answers from memory (304 when unchanged)
+_ui = StaticAsset(
+    [
         "index.html",
         os.path.join(os.path.dirname(__file__), "index.html"),
         os.path.join(os.getcwd(), "index.html"),
-    ]
-    for path in candidates:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        except FileNotFoundError:
-            continue
-
-    return """
+    ],
+    media_type="text/html; charset=utf-8",
+    fallback="""
     <html>
       <head><title>DebateShield Lite</title></head>
       <body style="font-family: system-ui; padding: 24px;">
@@ -81,7 +129,41 @@ def _read_ui() -> str:
         <p><b>index.html</b> not found in project root.</p>
       </body>
     </html>
+    """,
+    max_age=config.UI_CACHE_MAX_AGE_S,
+)
+
+
+def _group_batch_claims(claims: List[str], threshold: int = 85) -> List[int]:
+    """
+    Map each claim to the index of the claim whose analysis it reuses.
+    Exact duplicates (same normalized hash) collapse first, then near-duplicates
+    of an earlier group leader (fuzz.ratio >= threshold with the same negation
+    and numbers, as in Memory).
     """
+    leader_of: List[int] = []
+    by_hash: Dict[str, int] = {}
+    leaders: List[tuple] = []  # (index, normalized)
+    for i, claim in enumerate(claims):
+        claim_hash = memory.hash_claim(claim)
+        if claim_hash in by_hash:
+            leader_of.append(by_hash[claim_hash])
+            continue
+
+        normalized = memory.normalize_claim(claim)
+        # "X" and "X is not true" are close strings but opposite claims
+        leader = next(
+            (
+                j for j, other in leaders
+                if fuzz.ratio(normalized, other) >= threshold and semantic.compatible(claim, claims[j])
+            ),
+            i
+        )
+        if leader == i:
+            leaders.append((i, normalized))
+        by_hash[claim_hash] = leader
+        leader_of.append(leader)
+    return leader_of
 
 
 def _normalize_evidence(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -105,13 +187,34 @@ def _normalize_evidence(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 # -------------------------
 @app.on_event("startup")
 async def on_startup() -> None:
-    # Creates claims table in file DB
+    _ui.load()
+    # Opens pooled connections, creates claims table in file DB
+    await memory.connect()
     await memory.init_db()
+    await jobs.init_db()
+    await jobs.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await jobs.stop()
+    await you.aclose()
+    await cod.aclose()
+    await memory.close()
+
+
+@app.exception_handler(scheduler.Overloaded)
+async def on_overloaded(request: Request, exc: scheduler.Overloaded) -> FastJSONResponse:
+    return FastJSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.get("/", response_class=HTMLResponse)
-async def serve_ui() -> HTMLResponse:
-    return HTMLResponse(content=_read_ui())
+async def serve_ui(request: Request) -> Response:
+    return _ui.response(request)
 
 
 @app.get("/health")
@@ -121,7 +224,10 @@ async def health() -> Dict[str, Any]:
         "app": APP_TITLE,
         "version": APP_VERSION,
         "env": config.APP_ENV,
-        "db_path": config.DATABASE_PATH,
+        "worker_pid": os.getpid(),
+        "db_backend": memory.storage.name,
+        "json_backend": jsonutil.BACKEND,
+        "db_path": config.DATABASE_PATH if memory.storage.name == "sqlite" else None,
         "llm_configured": bool(config.LLM_API_KEY),
         "you_configured": bool(config.YOU_API_KEY),
         "intercom_configured": bool(getattr(config, "INTERCOM_TOKEN", "")) and bool(
@@ -130,62 +236,127 @@ async def health() -> Dict[str, Any]:
         "plivo_configured": bool(getattr(config, "PLIVO_AUTH_ID", "")) and bool(
             getattr(config, "PLIVO_AUTH_TOKEN", "")
         ),
+        "memory_cache": memory.cache_stats(),
+        "search_cache": you.cache_stats(),
+        "llm_cache": await cod.cache.stats() if cod.cache is not None else None,
+        "pipelines": {"inflight": _pipelines.inflight, "coalesced": _pipelines.shared},
+        "outbound": {"search": you.outbound.stats(), "llm": cod.outbound.stats()},
+        "scheduler": {
+            "pipeline": _admission.stats(),
+            "llm": cod.limiter.stats(),
+            "search": you.limiter.stats(),
+        },
+        "jobs": await jobs.stats(),
+        "ui": _ui.stats(),
     }
 
 
-@app.post("/analyze")
-async def analyze(req: AnalyzeRequest) -> JSONResponse:
+async def _run_pipeline(
+    claim: str, context: Dict[str, Any], emit: Emit = None, shed: bool = False
+) -> Dict[str, Any]:
+    """
+    Analyze a claim, coalescing concurrent requests for the same normalized
+    claim into one execution. Only the request that starts the execution
+    receives stage events; the others get the final result. With `shed`,
+    low-urgency claims raise scheduler.Overloaded instead of queueing when
+    admission is backed up. A caller without `shed` that joined an execution
+    which was shed starts (or joins) another one instead of failing.
+    """
     t0 = _now_ms()
-    claim = req.claim.strip()
-    context = (req.context or AnalyzeContext()).model_dump()
+    claim_hash = memory.hash_claim(claim)
+    while True:
+        # A more urgent caller joining a queued execution moves it up
+        _admission.boost(claim_hash, scheduler.priority_for(context))
+        joining = _pipelines.running(claim_hash)
+        try:
+            result, shared = await _pipelines.do(
+                claim_hash, lambda: _execute_pipeline(claim, context, emit, shed)
+            )
+            break
+        except scheduler.Overloaded:
+            # Batch and job callers always queue, even behind a shed /analyze leader
+            if shed or not joining:
+                raise
+    if not shared:
+        return result
+
+    # JSON round trip: a cheaper deep copy than copy.deepcopy with orjson
+    result = jsonutil.loads(jsonutil.dumpb(result))
+    result["claim"] = claim
+    result["context"] = context
+    result["meta"]["coalesced"] = True
+    result["meta"]["latency_ms"] = _now_ms() - t0
+    return result
+
+
+async def _execute_pipeline(
+    claim: str, context: Dict[str, Any], emit: Emit = None, shed: bool = False
+) -> Dict[str, Any]:
+    """Memory -> evidence -> debate -> actions -> store. `emit` receives stage events as they finish."""
+    t0 = _now_ms()
+    breakdown = metrics.start_request()
 
     # 1) Memory lookup (fast reuse)
     try:
-        cached = await memory.find_similar_claim(claim)
-        if cached and isinstance(cached, dict) and cached.get("json_blob"):
+        with metrics.stage("memory.lookup"):
+            cached = await memory.get_cached_verdict(claim)
+        if cached:
             blob = cached["json_blob"]
-            blob.setdefault("memory", {})
-            blob["memory"]["hit"] = True
-            blob["memory"]["matched_claim_id"] = cached.get("id")
+            blob["claim"] = claim
+            blob["context"] = context
+            blob["memory"] = {
+                "hit": True,
+                "matched_claim_id": cached.get("id"),
+                "matched_claim": cached.get("claim_text"),
+                "match_score": cached.get("match_score"),
+                "match_type": cached.get("match_type"),
+            }
             blob.setdefault("meta", {})
-            blob["meta"]["latency_ms"] = _now_ms() - t0
-            return JSONResponse(content=blob)
+            blob["meta"].update(latency_ms=_now_ms() - t0, **breakdown)
+            metrics.STAGE_SECONDS.observe(blob["meta"]["latency_ms"] / 1000, stage="total")
+            metrics.PIPELINE_RESULTS.inc(memory="hit")
+            return blob
     except Exception:
         # Keep demo running even if memory fails
         pass
 
-    # 2) Evidence retrieval (You.com or mock)
-    base_results = await you.search(claim, num_results=5)
-    debunk_results = await you.search(f"debunk {claim}", num_results=5)
+    # Everything past memory waits for an admission slot; search and LLM
+    # calls made from here inherit the priority
+    priority = scheduler.priority_for(context)
+    scheduler.set_priority(priority)
+    async with _admission.slot(priority, shed=shed, key=memory.hash_claim(claim)):
+        response = await _analyze_fresh(claim, context, emit)
+
+    latency_ms = _now_ms() - t0
+    metrics.STAGE_SECONDS.observe(latency_ms / 1000, stage="total")
+    metrics.PIPELINE_RESULTS.inc(memory="miss")
+    response["meta"].update(latency_ms=latency_ms, **breakdown)
+    return response
+
+
+async def _analyze_fresh(claim: str, context: Dict[str, Any], emit: Emit = None) -> Dict[str, Any]:
+    """Steps 2-5 of the pipeline for a claim memory could not answer"""
+    # 2) Evidence retrieval (You.com or mock), support + debunk queries concurrently
+    with metrics.stage("evidence"):
+        retrieved = await you.retrieve_evidence(claim, num_results=5)
 
-    base_results = _normalize_evidence(base_results)
-    debunk_results = _normalize_evidence(debunk_results)
+    base_results = _normalize_evidence(retrieved["support"])
+    debunk_results = _normalize_evidence(retrieved["refute"])
 
     evidence = {
         "for": base_results[:3],
         "against": debunk_results[:3],
         "all": (base_results + debunk_results)[:8],
     }
+    if emit is not None:
+        await emit("evidence", {"for": evidence["for"], "against": evidence["against"]})
 
     # 3) Chain-of-Debate
     try:
-        debate_out = await cod.run_debate(claim, evidence)
+        debate_out = await cod.run_debate(claim, evidence, on_event=emit)
     except Exception as e:
         debate_out = {
-            "verdict": "uncertain",
-            "confidence": 20,
-            "risk_level": "medium",
-            "topic": "general",
-            "why_bullets": ["CoD pipeline failed; returning conservative uncertainty."],
-            "uncertainties": [str(e)],
-            "debate_transcript": [
-                {"agent": "moderator", "message": "Fallback uncertain verdict due to error."}
-            ],
-            "reply_templates": {
-                "neutral": "I’m not fully sure this is accurate—worth checking reliable sources before sharing.",
-                "firm_mod": "We can’t verify this claim with reliable evidence right now.",
-                "friendly": "Not sure this is true—maybe double-check before reposting.",
-            },
+            **fallback_verdict(str(e)),
             "evidence_for": evidence["for"],
             "evidence_against": evidence["against"],
         }
@@ -208,22 +379,213 @@ async def analyze(req: AnalyzeRequest) -> JSONResponse:
         "reply_templates": debate_out.get("reply_templates", {}),
         "actions": {"intercom": {"sent": False}, "plivo_sms": {"sent": False}},
         "memory": {"hit": False, "matched_claim_id": None},
-        "meta": {"latency_ms": None},
+        "meta": {"latency_ms": None, "debate_tier": debate_out.get("debate_tier")},
     }
 
     # 4) Execute actions (Intercom/Plivo)
     try:
-        action_results = await actions.execute_actions(response)
+        with metrics.stage("actions"):
+            action_results = await actions.execute_actions(response)
         if isinstance(action_results, dict):
             response["actions"] = action_results
     except Exception:
         pass
 
-    # 5) Store in memory
+    # 5) Store in memory (full payload, replayed on later hits)
     try:
-        await memory.store_claim(response)
+        with metrics.stage("memory.store"):
+            await memory.store_claim(claim, response)
     except Exception:
         pass
 
-    response["meta"]["latency_ms"] = _now_ms() - t0
-    return JSONResponse(content=response)
+    return response
+
+
+# Async jobs run the same pipeline; defined after it so the runner resolves
+jobs = JobQueue(
+    memory,
+    runner=lambda claim, context: _run_pipeline(claim, context),
+    workers=config.JOBS_WORKERS,
+    poll_interval=config.JOBS_POLL_INTERVAL_S,
+    retention=config.JOBS_RETENTION_S,
+    callback_timeout=config.JOBS_CALLBACK_TIMEOUT_S,
+    lease=config.JOBS_LEASE_S,
+)
+
+
+# Point-in-time values refreshed on each scrape
+_CACHE_EVENTS = metrics.Gauge(
+    "debateshield_cache_events", "Cache lookups since start by cache and outcome", ["cache", "outcome"]
+)
+_INFLIGHT = metrics.Gauge("debateshield_pipelines_inflight", "Pipelines currently executing")
+_OUTBOUND = metrics.Gauge(
+    "debateshield_outbound_events", "Upstream call retries and failures since start", ["upstream", "outcome"]
+)
+_QUEUED = metrics.Gauge(
+    "debateshield_queue_depth", "Requests waiting for a slot by limiter and priority", ["limiter", "priority"]
+)
+_SHED = metrics.Gauge(
+    "debateshield_shed", "Requests shed (429) since start by limiter and priority", ["limiter", "priority"]
+)
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition"""
+    mem = memory.cache_stats()
+    _CACHE_EVENTS.set(mem["hits"], cache="verdict", outcome="hit")
+    _CACHE_EVENTS.set(mem["misses"], cache="verdict", outcome="miss")
+    search = you.cache_stats()
+    _CACHE_EVENTS.set(search["hits"], cache="search", outcome="hit")
+    _CACHE_EVENTS.set(search["stale_hits"], cache="search", outcome="stale")
+    _CACHE_EVENTS.set(search["misses"], cache="search", outcome="miss")
+    if cod.cache is not None:
+        _CACHE_EVENTS.set(cod.cache.hits, cache="llm", outcome="hit")
+        _CACHE_EVENTS.set(cod.cache.misses, cache="llm", outcome="miss")
+    _INFLIGHT.set(_pipelines.inflight)
+    for name, policy in (("search", you.outbound), ("llm", cod.outbound)):
+        stats = policy.stats()
+        _OUTBOUND.set(stats["retries"], upstream=name, outcome="retry")
+        _OUTBOUND.set(stats["failures"], upstream=name, outcome="failure")
+        _OUTBOUND.set(stats["rejected"], upstream=name, outcome="circuit_open")
+    for name, limiter in (("pipeline", _admission), ("llm", cod.limiter), ("search", you.limiter)):
+        stats = limiter.stats()
+        for priority, depth in stats["queued"].items():
+            _QUEUED.set(depth, limiter=name, priority=priority)
+            _SHED.set(stats["shed"][priority], limiter=name, priority=priority)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/analyze")
+async def analyze(req: AnalyzeRequest) -> FastJSONResponse:
+    claim = req.claim.strip()
+    context = (req.context or AnalyzeContext()).model_dump()
+    return FastJSONResponse(content=await _run_pipeline(claim, context, shed=True))
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest) -> FastJSONResponse:
+    """
+    Analyze many claims at once. Duplicates and near-duplicates are analyzed
+    once; the remaining pipelines (each checking memory first) run under
+    BATCH_CONCURRENCY. Results come back in input order.
+    """
+    t0 = _now_ms()
+    claims = [c.strip() for c in req.claims]
+    context = (req.context or AnalyzeContext()).model_dump()
+
+    leader_of = _group_batch_claims(claims)
+    leaders = sorted(set(leader_of))
+    semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+
+    async def run_one(i: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await _run_pipeline(claims[i], context)
+
+    outcomes = await asyncio.gather(*(run_one(i) for i in leaders), return_exceptions=True)
+    by_leader = dict(zip(leaders, outcomes))
+
+    results: List[Dict[str, Any]] = []
+    for i, claim in enumerate(claims):
+        leader = leader_of[i]
+        outcome = by_leader[leader]
+        if isinstance(outcome, BaseException):
+            item: Dict[str, Any] = {"claim": claim, "error": str(outcome) or type(outcome).__name__}
+        else:
+            item = {**outcome, "claim": claim}
+        item["batch"] = {"index": i, "shared_with": leader if leader != i else None}
+        results.append(item)
+
+    return FastJSONResponse(
+        content={
+            "results": results,
+            "meta": {
+                "total": len(claims),
+                "analyzed": len(leaders),
+                "memory_hits": sum(
+                    1 for o in outcomes
+                    if isinstance(o, dict) and o.get("memory", {}).get("hit")
+                ),
+                "latency_ms": _now_ms() - t0,
+            },
+        }
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: JobRequest) -> FastJSONResponse:
+    """Queue a claim for background analysis; poll GET /jobs/{id} or wait for the callback"""
+    claim = req.claim.strip()
+    context = (req.context or AnalyzeContext()).model_dump()
+    try:
+        job = await jobs.submit(claim, context, callback_url=req.callback_url)
+    except ValueError as e:
+        return FastJSONResponse(status_code=422, content={"detail": str(e)})
+    return FastJSONResponse(
+        status_code=202,
+        content={
+            "job_id": job["id"],
+            "status": job["status"],
+            "priority": job["priority"],
+            "poll_url": f"/jobs/{job['id']}",
+        },
+        headers={"Location": f"/jobs/{job['id']}"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> FastJSONResponse:
+    job = await jobs.get(job_id)
+    if job is None:
+        return FastJSONResponse(status_code=404, content={"detail": "Job not found"})
+    return FastJSONResponse(content=job)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {jsonutil.dumps(data)}\n\n"
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(req: AnalyzeRequest) -> StreamingResponse:
+    """
+    Server-sent events variant of /analyze. Events, in order:
+    evidence, agent (verifier/skeptic, as each finishes), token (moderator
+    output as it streams), verdict (verdict and confidence as soon as the
+    deciding agent has generated them), result (the full /analyze payload,
+    authoritative) or error.
+    """
+    claim = req.claim.strip()
+    context = (req.context or AnalyzeContext()).model_dump()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await queue.put(_sse(event, data))
+
+    async def run() -> None:
+        try:
+            result = await _run_pipeline(claim, context, emit=emit, shed=True)
+            await queue.put(_sse("result", result))
+        except scheduler.Overloaded as e:
+            await queue.put(_sse("error", {"detail": str(e), "retry_after": e.retry_after}))
+        except Exception as e:
+            await queue.put(_sse("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    # Not cancelled on client disconnect: the verdict still lands in memory
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    async def events() -> AsyncIterator[str]:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,35 +1,100 @@
 """Memory system for storing and retrieving past claim verdicts"""
-import aiosqlite
 import hashlib
-import json
-from datetime import datetime
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, List, Set, Tuple
 from fuzzywuzzy import fuzz
 
+import claim_index
+import jsonutil
+import semantic
+from cache import TTLCache
+from config import config
+from storage import SQLiteStorage
+
+
 class Memory:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
+    def __init__(
+        self,
+        db_path: str = "",
+        read_pool_size: int = 4,
+        hot_cache_size: int = 10000,
+        negative_ttl: float = 30.0,
+        semantic_match: bool = False,
+        semantic_threshold: float = 0.85,
+        semantic_top_k: int = 5,
+        semantic_max_vectors: int = 200_000,
+        storage: Any = None
+    ):
+        # Persistence backend (see storage.py); SQLite at db_path unless one is given
+        self.storage = storage or SQLiteStorage(db_path, read_pool_size=read_pool_size)
+        # Verdict cache counters (process lifetime)
+        self.hits = 0
+        self.hot_hits = 0
+        self.misses = 0
+        
+        # Hot tier in front of the database, keyed by claim hash of the lookup.
+        # Values keep json_blob serialized so every hit gets a fresh copy.
+        self._hot = TTLCache(hot_cache_size, on_evict=self._unindex_hot)
+        # Stored claim hash -> hot keys whose entry points at that row, so an
+        # overwrite drops exactly those entries
+        self._hot_keys: Dict[str, Set[str]] = {}
+        # Recent misses; cleared whenever a claim is stored
+        self._negative = TTLCache(hot_cache_size)
+        self.negative_ttl = negative_ttl
+        
+        # Optional paraphrase matching: claim vectors in an in-process index,
+        # loaded from the embedding column by init_db
+        self._vectors = semantic.VectorIndex(max_items=semantic_max_vectors) if semantic_match else None
+        self.semantic_threshold = semantic_threshold
+        self.semantic_top_k = semantic_top_k
+        self.semantic_hits = 0
+        
+        # Other processes (workers, nodes) write to the same database; polled
+        # at most every sync_interval, from the backend's change marker
+        self._change_marker: Any = None
+        self._next_sync = 0.0
+        self.sync_interval = 0.5
+    
+    async def connect(self):
+        """Open pooled connections (idempotent; called on app startup)"""
+        await self.storage.connect()
+    
+    async def close(self):
+        """Close pooled connections (called on app shutdown)"""
+        await self.storage.close()
     
     async def init_db(self):
-        """Initialize the database schema"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS claims (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    claim_hash TEXT UNIQUE,
-                    claim_text TEXT,
-                    normalized_claim TEXT,
-                    verdict TEXT,
-                    confidence INTEGER,
-                    risk_level TEXT,
-                    topic TEXT,
-                    evidence_for TEXT,
-                    evidence_against TEXT,
-                    actions_taken TEXT,
-                    timestamp TEXT
-                )
-            """)
-            await db.commit()
+        """Bring the schema up to date, then load the semantic index if enabled"""
+        await self.storage.migrate()
+        # Taken first: claims written while the index loads are picked up by the next poll
+        self._change_marker = await self.storage.change_marker()
+        if self._vectors is not None:
+            async for vectors in self.storage.load_embeddings(lambda text: semantic.pack(semantic.embed(text))):
+                for claim_id, blob in vectors:
+                    self._vectors.add(claim_id, blob)
+    
+    async def _sync_external_writes(self):
+        """
+        Notice claims committed by other worker processes (checked at most every
+        sync_interval): forget cached misses, drop hot entries served from
+        claims that changed, and index their new vectors.
+        """
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        
+        changed, changes, self._change_marker = await self.storage.poll_changes(
+            self._change_marker, with_vectors=self._vectors is not None
+        )
+        if not changed:
+            return
+        self._negative.clear()
+        # Includes this process's own writes; their primed entries are re-read once
+        for claim_id, claim_hash, blob in changes:
+            self._drop_hot(claim_hash)
+            if blob is not None and self._vectors is not None:
+                self._vectors.add(claim_id, blob)
     
     def normalize_claim(self, claim: str) -> str:
         """Normalize claim text for fuzzy matching"""
@@ -41,76 +106,201 @@ class Memory:
         normalized = self.normalize_claim(claim)
         return hashlib.md5(normalized.encode()).hexdigest()
     
-    async def find_similar_claim(self, claim: str, threshold: int = 85) -> Optional[Dict[str, Any]]:
-        """Find a similar claim using fuzzy matching"""
+    async def find_similar_claim(
+        self, claim: str, threshold: int = 85, max_candidates: int = 25
+    ) -> Optional[Dict[str, Any]]:
+        """Find a similar claim: exact hash, then fuzzy-score LSH candidates, then (optionally) semantic top-k"""
         normalized = self.normalize_claim(claim)
+        best_match = await self.storage.get_claim(self.hash_claim(claim))
+        best_score = 100 if best_match else 0
+        match_type = "exact"
         
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
-                "SELECT * FROM claims ORDER BY timestamp DESC LIMIT 100"
-            )
-            rows = await cursor.fetchall()
-            
-            best_match = None
-            best_score = 0
-            
+        if best_match is None:
+            # Candidates share at least one LSH bucket; only their text is read,
+            # the winner's full row is fetched below
+            rows = await self.storage.lsh_candidates(claim_index.bucket_keys(normalized), max_candidates)
+            best_id = None
             for row in rows:
                 score = fuzz.ratio(normalized, row["normalized_claim"])
-                if score > best_score and score >= threshold:
+                # "X" and "X is not true" are close strings but opposite claims
+                if score > best_score and score >= threshold and semantic.compatible(
+                    claim, row["claim_text"] or ""
+                ):
                     best_score = score
-                    best_match = dict(row)
-            
-            if best_match:
-                # Parse JSON fields
-                best_match["evidence_for"] = json.loads(best_match["evidence_for"])
-                best_match["evidence_against"] = json.loads(best_match["evidence_against"])
-                best_match["actions_taken"] = json.loads(best_match["actions_taken"])
-                best_match["match_score"] = best_score
-            
-            return best_match
+                    best_id = row["id"]
+            if best_id is not None:
+                best_match = (await self.storage.get_claims([best_id])).get(best_id)
+                match_type = "fuzzy"
+        
+        if best_match is None and self._vectors is not None:
+            found = await self._semantic_match(claim)
+            if found is not None:
+                best_match, best_score = found
+                match_type = "semantic"
+        
+        if best_match:
+            # The stored payload carries evidence and actions
+            payload = best_match.pop("result")
+            best_match["json_blob"] = payload
+            best_match["evidence_for"] = (payload or {}).get("evidence_for", [])
+            best_match["evidence_against"] = (payload or {}).get("evidence_against", [])
+            best_match["actions_taken"] = (payload or {}).get("actions", {})
+            best_match["match_score"] = best_score
+            best_match["match_type"] = match_type
+        
+        return best_match
     
-    async def store_claim(self, claim: str, verdict_data: Dict[str, Any]):
-        """Store a new claim and its verdict"""
+    async def _semantic_match(self, claim: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Best paraphrase above semantic_threshold with the same negation and numbers"""
+        hits = [
+            (claim_id, score)
+            for claim_id, score in self._vectors.search(semantic.embed(claim), self.semantic_top_k)
+            if score >= self.semantic_threshold
+        ]
+        if not hits:
+            return None
+        rows = await self.storage.get_claims([claim_id for claim_id, _ in hits])
+        for claim_id, score in hits:
+            row = rows.get(claim_id)
+            if row is not None and semantic.compatible(claim, row["claim_text"] or ""):
+                self.semantic_hits += 1
+                return row, min(100, round(score * 100))
+        return None
+    
+    def verdict_ttl(self, verdict_data: Dict[str, Any]) -> float:
+        """How long a verdict may be served from the hot tier"""
+        verdict = verdict_data.get("verdict")
+        confidence = verdict_data.get("confidence") or 0
+        if verdict == "uncertain":
+            return config.CACHE_TTL_UNCERTAIN_S
+        if verdict in ("true", "false") and confidence >= 80:
+            return config.CACHE_TTL_CONFIDENT_S
+        return config.CACHE_TTL_DEFAULT_S
+    
+    def _remember(self, claim_hash: str, match: Dict[str, Any]):
+        entry = {**match, "json_blob": jsonutil.dumpb(match["json_blob"])}
+        ttl = self.verdict_ttl(match["json_blob"])
+        if ttl <= 0 or self._hot.maxsize <= 0:
+            return
+        self._hot.set(claim_hash, entry, ttl=ttl)
+        self._hot_keys.setdefault(match["claim_hash"], set()).add(claim_hash)
+    
+    def _unindex_hot(self, key: str, entry: Dict[str, Any]):
+        keys = self._hot_keys.get(entry["claim_hash"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._hot_keys[entry["claim_hash"]]
+    
+    def _drop_hot(self, claim_hash: str):
+        """Forget hot entries served from the stored claim claim_hash"""
+        for key in list(self._hot_keys.get(claim_hash, ())):
+            self._hot.pop(key)
+    
+    async def get_cached_verdict(self, claim: str, threshold: int = 85) -> Optional[Dict[str, Any]]:
+        """Return a replayable stored verdict for the claim, counting hits/misses"""
         claim_hash = self.hash_claim(claim)
-        normalized = self.normalize_claim(claim)
+        # Before the hot tier, so an overwrite by another process is not served stale
+        await self._sync_external_writes()
+        
+        entry = self._hot.get(claim_hash)
+        if entry is not None:
+            self.hits += 1
+            self.hot_hits += 1
+            return {**entry, "json_blob": jsonutil.loads(entry["json_blob"])}
+        
+        if self._negative.get(claim_hash):
+            self.misses += 1
+            return None
+        
+        match = await self.find_similar_claim(claim, threshold)
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO claims 
-                (claim_hash, claim_text, normalized_claim, verdict, confidence, 
-                 risk_level, topic, evidence_for, evidence_against, actions_taken, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                claim_hash,
-                claim,
-                normalized,
-                verdict_data.get("verdict"),
-                verdict_data.get("confidence"),
-                verdict_data.get("risk_level"),
-                verdict_data.get("topic"),
-                json.dumps(verdict_data.get("evidence_for", [])),
-                json.dumps(verdict_data.get("evidence_against", [])),
-                json.dumps(verdict_data.get("actions", {})),
-                datetime.utcnow().isoformat()
-            ))
-            await db.commit()
+        # Rows stored before json_blob existed cannot be replayed
+        if match and match.get("json_blob"):
+            self.hits += 1
+            self._remember(claim_hash, match)
+            return match
+        
+        self.misses += 1
+        self._negative.set(claim_hash, True, ttl=self.negative_ttl)
+        return None
+    
+    async def store_claim(self, claim: str, verdict_data: Dict[str, Any]):
+        """Store a new claim and its verdict (verdict_data is the full response payload)"""
+        await self.store_claims([{"claim_text": claim, "result": verdict_data}])
+    
+    async def store_claims(self, claims: List[Dict[str, Any]]):
+        """
+        Store many claims in one write. Each item has `claim_text` and `result`
+        (the response payload), optionally `created_at`/`updated_at` epochs.
+        """
+        records = []
+        for item in claims:
+            claim, verdict_data = item["claim_text"], item["result"]
+            normalized = self.normalize_claim(claim)
+            vector = semantic.embed(claim) if self._vectors is not None else None
+            records.append({
+                "claim_hash": self.hash_claim(claim),
+                "claim_text": claim,
+                "normalized_claim": normalized,
+                "verdict": verdict_data.get("verdict"),
+                "confidence": verdict_data.get("confidence"),
+                "risk_level": verdict_data.get("risk_level"),
+                "topic": verdict_data.get("topic"),
+                "created_at": item.get("created_at"),
+                "updated_at": item.get("updated_at"),
+                "result": verdict_data,
+                "embedding": semantic.pack(vector) if vector is not None else None,
+                "buckets": claim_index.bucket_keys(normalized),
+            })
+        if not records:
+            return
+        ids = await self.storage.upsert_claims(records)
+        
+        # Any earlier miss might match these claims now
+        self._negative.clear()
+        stored = {record["claim_hash"]: (claim_id, record) for claim_id, record in zip(ids, records)}
+        for claim_hash in stored:
+            self._drop_hot(claim_hash)
+        for claim_hash, (claim_id, record) in stored.items():
+            if record["embedding"] is not None:
+                self._vectors.add(claim_id, record["embedding"])
+            # Drop hot entries that pointed at the overwritten row (above), then prime the new one
+            self._remember(claim_hash, {
+                "id": claim_id,
+                "claim_hash": claim_hash,
+                "claim_text": record["claim_text"],
+                "normalized_claim": record["normalized_claim"],
+                "verdict": record["verdict"],
+                "confidence": record["confidence"],
+                "match_score": 100,
+                "match_type": "exact",
+                "json_blob": record["result"]
+            })
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Verdict cache hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "hot_hits": self.hot_hits,
+            "misses": self.misses,
+            "hot_entries": len(self._hot),
+            "semantic_hits": self.semantic_hits,
+            "semantic_vectors": len(self._vectors) if self._vectors is not None else None,
+            "semantic_vectors_evicted": self._vectors.evicted if self._vectors is not None else None,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
     
     async def get_stats(self) -> Dict[str, Any]:
-        """Get memory statistics"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT COUNT(*) as count FROM claims")
-            row = await cursor.fetchone()
-            total_claims = row[0] if row else 0
-            
-            cursor = await db.execute("""
-                SELECT verdict, COUNT(*) as count 
-                FROM claims 
-                GROUP BY verdict
-            """)
-            verdict_counts = {row[0]: row[1] for row in await cursor.fetchall()}
-            
-            return {
-                "total_claims": total_claims,
-                "verdict_breakdown": verdict_counts
+        """Get memory statistics (from trigger-maintained counters, no table scans)"""
+        counters = await self.storage.claim_counters()
+        
+        return {
+            "total_claims": counters.get("total", 0),
+            "verdict_breakdown": {
+                name.split(":", 1)[1] or None: value
+                for name, value in counters.items()
+                if name.startswith("verdict:") and value
             }
+        }
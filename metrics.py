@@ -0,0 +1,160 @@
+"""Prometheus-style metrics and per-request stage timing (no client library needed)"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # label values -> ([bucket counts], sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, (counts, total, n) in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = _labels(self.labelnames, key, f'le="{_fmt(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+def render() -> str:
+    """Text exposition format for every registered metric"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Pipeline metrics
+# -------------------------
+STAGE_SECONDS = Histogram(
+    "debateshield_stage_seconds", "Latency of each pipeline stage", ["stage"]
+)
+LLM_TOKENS = Counter(
+    "debateshield_llm_tokens_total", "LLM tokens by agent and kind (prompt|completion)",
+    ["agent", "kind"]
+)
+PIPELINE_RESULTS = Counter(
+    "debateshield_pipeline_total", "Completed pipelines by memory outcome", ["memory"]
+)
+
+# Per-request breakdown, shared by tasks spawned while handling the request
+_breakdown: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "stage_breakdown", default=None
+)
+
+
+def start_request() -> Dict[str, Any]:
+    """Begin collecting stage timings (ms) and token usage for the current request"""
+    breakdown: Dict[str, Any] = {"stages": {}, "tokens": {}}
+    _breakdown.set(breakdown)
+    return breakdown
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the stage histogram and the current request's breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown["stages"][name] = round(elapsed * 1000, 1)
+
+
+async def timed(name: str, call: Awaitable[T]) -> T:
+    """Await `call` inside stage(name)"""
+    with stage(name):
+        return await call
+
+
+def record_tokens(agent: str, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, agent=agent, kind="completion")
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        breakdown["tokens"][agent] = {"prompt": prompt_tokens, "completion": completion_tokens}
@@ -0,0 +1,225 @@
+"""Outbound call policy for upstream APIs: token-bucket throttling, retries with backoff, circuit breaking"""
+import asyncio
+import email.utils
+import itertools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+T = TypeVar("T")
+
+# Worth another attempt: throttling and transient server/gateway failures
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while its breaker is open"""
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    # openai.APIStatusError has status_code; httpx.HTTPStatusError has response.status_code
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header (delta or HTTP date) on the error's response"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (httpx.TransportError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return _status(exc) in RETRY_STATUSES
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`; rate <= 0 means unlimited"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after upstream answers 429 with Retry-After"""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    async def acquire(self) -> None:
+        # The lock makes waiters queue in arrival order instead of racing for tokens
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    return
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets one trial call through
+    (half-open): success closes it, failure opens it again. allow() hands
+    each admitted call a ticket that it passes back with its outcome, so only
+    the trial call itself can end the trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._tickets = itertools.count(1)
+        self._trial: Optional[int] = None  # ticket of the running trial call
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[int]:
+        """A ticket for the call, or None to reject it"""
+        state = self.state
+        if state == "closed":
+            return next(self._tickets)
+        if state == "half_open" and self._trial is None:
+            self._trial = next(self._tickets)
+            return self._trial
+        self.rejected += 1
+        return None
+
+    def record_success(self, ticket: int) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = None
+
+    def abandon(self, ticket: int) -> None:
+        """The call ended with no health signal; if it was the trial, let another one through"""
+        if ticket == self._trial:
+            self._trial = None
+
+    def record_failure(self, ticket: int) -> None:
+        self.failures += 1
+        if ticket == self._trial or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        if ticket == self._trial:
+            self._trial = None
+
+
+class OutboundPolicy:
+    """
+    Wraps every call to one upstream. Each attempt waits for the token
+    bucket; retryable failures back off exponentially with full jitter,
+    or for the server's Retry-After when given (a 429 pauses the whole
+    bucket so other callers stop too). Transient failures feed the
+    circuit breaker; while it is open calls fail fast with CircuitOpenError.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: float = 1.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after(exc)
+        if hinted is not None:
+            if _status(exc) == 429:
+                self.bucket.pause(min(hinted, self.backoff_max))
+            return min(hinted, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        attempt = 0
+        while True:
+            ticket = self.breaker.allow()
+            if ticket is None:
+                self.failures += 1
+                raise CircuitOpenError(f"{self.name} circuit open after repeated failures")
+            try:
+                await self.bucket.acquire()
+                result = await fn()
+            except asyncio.CancelledError:
+                # Caller gave up (e.g. agent timeout); says nothing about upstream health
+                self.breaker.abandon(ticket)
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered (bad request, auth...): neither healthy nor failing
+                    self.breaker.abandon(ticket)
+                    self.failures += 1
+                    raise
+                # Throttling means the upstream is alive but says nothing else; only real failures trip the breaker
+                if _status(e) == 429:
+                    self.breaker.abandon(ticket)
+                else:
+                    self.breaker.record_failure(ticket)
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                print(f"[{self.name}] {type(e).__name__} ({_status(e) or 'no status'}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success(ticket)
+                return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.state,
+            "rejected": self.breaker.rejected,
+        }
@@ -80,6 +80,8 @@ def main():
         host="0.0.0.0",
         port=8000,
         reload=True,
+        # index.html is cached in memory at startup, so edits to it need a reload too
+        reload_includes=["*.py", "index.html"],
         log_level="info"
     )
 
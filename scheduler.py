@@ -0,0 +1,143 @@
+"""Priority scheduling: urgency-ordered concurrency limits with load shedding"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Tuple
+
+# Lower runs first; keyed by AnalyzeContext.urgency_hint
+PRIORITIES = {"high": 0, "medium": 1, "low": 2}
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+# Bulk feeds wait behind people: non-high news claims drop one level
+_DEMOTED_SOURCES = {"news"}
+
+# Priority of the request being served; read by the LLM and search limiters
+_current: ContextVar[int] = ContextVar("priority", default=PRIORITIES["medium"])
+
+
+def priority_for(context: Dict[str, Any]) -> int:
+    """Scheduling priority for an AnalyzeContext dict"""
+    level = PRIORITIES.get(str(context.get("urgency_hint", "medium")).lower(), PRIORITIES["medium"])
+    if level != PRIORITIES["high"] and str(context.get("source", "")).lower() in _DEMOTED_SOURCES:
+        level = min(level + 1, PRIORITIES["low"])
+    return level
+
+
+def set_priority(priority: int) -> None:
+    """Tag the current task (and tasks it spawns) with a priority"""
+    _current.set(priority)
+
+
+def current_priority() -> int:
+    return _current.get()
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing when a shed-able priority's queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PriorityLimiter:
+    """
+    A semaphore that hands freed slots to the highest-priority waiter
+    (FIFO within a priority). `max_waiting` caps the queue per priority for
+    callers that opt into shedding; over the cap they get Overloaded with a
+    Retry-After estimated from recent slot hold times. Waiters that pass a
+    `key` can be moved up later with boost(key, priority), so urgent callers
+    sharing a queued execution are not stuck behind its original priority.
+    """
+
+    def __init__(self, limit: int, max_waiting: Optional[Dict[int, int]] = None):
+        self.limit = max(1, limit)
+        self.max_waiting = max_waiting or {}
+        self.active = 0
+        self.waiting = {level: 0 for level in PRIORITIES.values()}
+        self.shed = {level: 0 for level in PRIORITIES.values()}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._keyed: Dict[Hashable, List[Any]] = {}  # key -> [priority, future]
+        self._hold_s = 1.0  # moving average of time a slot is held
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Optional[int] = None, shed: bool = False, key: Optional[Hashable] = None
+    ) -> AsyncIterator[None]:
+        priority = current_priority() if priority is None else priority
+        await self.acquire(priority, shed, key)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_s = 0.9 * self._hold_s + 0.1 * (time.monotonic() - started)
+            self.release()
+
+    async def acquire(self, priority: int, shed: bool = False, key: Optional[Hashable] = None) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        cap = self.max_waiting.get(priority)
+        if shed and cap is not None and self.waiting.get(priority, 0) >= cap:
+            self.shed[priority] = self.shed.get(priority, 0) + 1
+            raise Overloaded(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.waiting[priority] = self.waiting.get(priority, 0) + 1
+        entry = [priority, future]
+        if key is not None:
+            self._keyed[key] = entry
+        try:
+            # release() hands the slot over by resolving the future; active is unchanged
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed to us just as we were cancelled; pass it on
+                self.release()
+            raise
+        finally:
+            self.waiting[entry[0]] -= 1
+            if key is not None and self._keyed.get(key) is entry:
+                del self._keyed[key]
+
+    def boost(self, key: Hashable, priority: int) -> None:
+        """Raise a queued waiter to `priority` (no-op if it is not queued or already higher)"""
+        entry = self._keyed.get(key)
+        if entry is None or entry[0] <= priority or entry[1].done():
+            return
+        self.waiting[entry[0]] -= 1
+        self.waiting[priority] = self.waiting.get(priority, 0) + 1
+        entry[0] = priority
+        # The old heap entry is left behind; release() skips futures already resolved
+        heapq.heappush(self._waiters, (priority, next(self._seq), entry[1]))
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        queued = sum(self.waiting.values()) + 1
+        return max(1, math.ceil(self._hold_s * queued / self.limit))
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.limit
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": {PRIORITY_NAMES[level]: n for level, n in self.waiting.items()},
+            "shed": {PRIORITY_NAMES[level]: n for level, n in self.shed.items()},
+        }
@@ -0,0 +1,218 @@
+"""Semantic claim vectors and an in-process top-k index (CPU-only, no model download)
+
+A claim becomes a sparse vector of hashed features: stemmed content words
+(so "vaccines cause autism" and "autism is caused by vaccination" share
+every word feature), character trigrams of those stems for spelling and
+morphology slack, and bigrams of consecutive stems for word order, so
+"autism causes vaccines" does not match "vaccines cause autism". Passive
+claims ("X is caused by Y") are reordered to their active form first. Stopwords are ignored. Vectors are
+L2-normalized, so a dot product is the cosine similarity.
+
+Because bag-of-words similarity cannot see polarity or quantities, matches
+must also agree on negation and on the numbers mentioned (see compatible());
+Memory applies the same check to fuzzy matches.
+"""
+import hashlib
+import heapq
+import math
+import re
+import struct
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+DIM_BITS = 20  # each feature kind is hashed into 2**20 slots
+_KINDS = {"w": 0, "g": 1, "b": 2}  # word features get ids below 2**DIM_BITS, trigrams and bigrams above
+TRIGRAM_WEIGHT = 0.35  # trigram mass relative to the word feature of the same stem
+BIGRAM_WEIGHT = 0.7  # per ordered pair of consecutive stems; keeps swapped roles under the 0.85 default threshold
+
+Vector = Dict[int, float]
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+STOPWORDS = frozenset("""
+a an the is are was were be been being am do does did has have had of in on at to
+for from by with as and or but if then that this these those it its it's they them
+their there here which who whom what when where why how all any some can could will
+would shall should may might must so such than too very just about into over under
+i you he she we me my your our his her us
+""".split())
+
+NEGATIONS = frozenset("""
+not no never none nobody nothing nowhere neither nor without cannot
+isn't aren't wasn't weren't don't doesn't didn't won't can't couldn't shouldn't
+wouldn't hasn't haven't hadn't false fake myth hoax
+""".split())
+
+# "is caused by": a form of "to be", later followed by "by"
+_PASSIVE_BE = frozenset("is are was were be been being".split())
+
+# Longest first; a suffix is only stripped if at least 3 characters remain
+_SUFFIXES = (
+    "izations", "ization", "ational", "fulness", "ousness", "iveness",
+    "ations", "ation", "ments", "ment", "ings", "ing", "ated", "ates", "ate",
+    "ies", "ied", "ers", "er", "es", "ed", "ly", "s", "e",
+)
+
+
+def stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower().replace("’", "'"))
+
+
+def _feature(kind: str, value: str) -> int:
+    digest = hashlib.blake2b(f"{kind}:{value}".encode(), digest_size=4).digest()
+    return (_KINDS[kind] << DIM_BITS) | (int.from_bytes(digest, "little") & ((1 << DIM_BITS) - 1))
+
+
+def is_word_feature(feature: int) -> bool:
+    return feature >> DIM_BITS == _KINDS["w"]
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    if len(b) < len(a):
+        a, b = b, a
+    return sum(weight * b.get(feature, 0.0) for feature, weight in a.items())
+
+
+def _active_order(tokens: List[str]) -> List[str]:
+    """Tokens of "X is caused by Y" in the order "Y caused X"; other claims unchanged"""
+    for i, token in enumerate(tokens):
+        if token in _PASSIVE_BE:
+            if "by" in tokens[i + 1:]:
+                j = tokens.index("by", i + 1)
+                return tokens[j + 1:] + tokens[i + 1:j] + tokens[:i]
+            break
+    return tokens
+
+
+def embed(text: str) -> Vector:
+    """Sparse L2-normalized feature vector for a claim"""
+    weights: Counter = Counter()
+    stems = [
+        stem(word) for word in _active_order(words(text))
+        if word not in STOPWORDS and word not in NEGATIONS
+    ]
+    for stemmed in stems:
+        weights[_feature("w", stemmed)] += 1.0
+        padded = f"^{stemmed}$"
+        grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for gram in grams:
+            weights[_feature("g", gram)] += TRIGRAM_WEIGHT / len(grams)
+    for first, second in zip(stems, stems[1:]):
+        weights[_feature("b", f"{first} {second}")] += BIGRAM_WEIGHT
+    # Sublinear term frequency, then unit length
+    vector = {f: 1.0 + math.log(w) if w >= 1 else w for f, w in weights.items()}
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {f: w / norm for f, w in vector.items()} if norm else {}
+
+
+def polarity(text: str) -> Tuple[bool, Set[str]]:
+    """(odd number of negations, numbers mentioned): both must agree for claims to match"""
+    tokens = words(text)
+    negated = sum(1 for t in tokens if t in NEGATIONS) % 2 == 1
+    return negated, set(_NUMBER.findall(text))
+
+
+def compatible(a: str, b: str) -> bool:
+    return polarity(a) == polarity(b)
+
+
+_PACK_HEAD = struct.Struct("<I")
+
+
+def pack(vector: Vector) -> bytes:
+    """Compact BLOB: count, then feature ids (uint32) and weights (float32)"""
+    ids = sorted(vector)
+    return (
+        _PACK_HEAD.pack(len(ids))
+        + struct.pack(f"<{len(ids)}I", *ids)
+        + struct.pack(f"<{len(ids)}f", *(vector[i] for i in ids))
+    )
+
+
+def unpack(blob: bytes) -> Vector:
+    (count,) = _PACK_HEAD.unpack_from(blob)
+    ids = struct.unpack_from(f"<{count}I", blob, 4)
+    weights = struct.unpack_from(f"<{count}f", blob, 4 + 4 * count)
+    return dict(zip(ids, weights))
+
+
+def _packed_ids(blob: bytes) -> Tuple[int, ...]:
+    (count,) = _PACK_HEAD.unpack_from(blob)
+    return struct.unpack_from(f"<{count}I", blob, 4)
+
+
+def _packed_cosine(vector: Vector, blob: bytes) -> float:
+    """cosine(vector, unpack(blob)) without building the dict"""
+    ids = _packed_ids(blob)
+    weights = struct.unpack_from(f"<{len(ids)}f", blob, 4 + 4 * len(ids))
+    return sum(weight * vector.get(feature, 0.0) for feature, weight in zip(ids, weights))
+
+
+class VectorIndex:
+    """
+    Inverted index from word features to claim ids. A search takes candidates
+    from the rarest query words first (a paraphrase shares its content words,
+    rare ones included), stops growing the set at max_candidates, then scores
+    candidates by exact cosine. Cost follows posting list sizes, not the
+    number of stored claims.
+
+    Vectors are kept packed (a few hundred bytes per claim) and at most
+    max_items of them: past that, the claims indexed longest ago are dropped
+    and can still be found by exact and fuzzy lookup.
+    """
+
+    def __init__(self, max_candidates: int = 1000, max_items: int = 200_000):
+        self.max_candidates = max_candidates
+        self.max_items = max_items
+        self.evicted = 0
+        self._postings: Dict[int, Set[int]] = {}
+        # Insertion order: the first entry is the oldest
+        self._vectors: Dict[int, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def add(self, item_id: int, blob: bytes) -> None:
+        """Index a vector as stored by pack()"""
+        self.remove(item_id)
+        self._vectors[item_id] = blob
+        for feature in _packed_ids(blob):
+            if is_word_feature(feature):
+                self._postings.setdefault(feature, set()).add(item_id)
+        while self.max_items and len(self._vectors) > self.max_items:
+            self.remove(next(iter(self._vectors)))
+            self.evicted += 1
+
+    def remove(self, item_id: int) -> None:
+        blob = self._vectors.pop(item_id, None)
+        for feature in _packed_ids(blob) if blob is not None else ():
+            posting = self._postings.get(feature)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    del self._postings[feature]
+
+    def search(self, vector: Vector, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (id, cosine), best first"""
+        postings = sorted(
+            (self._postings[f] for f in vector if is_word_feature(f) and f in self._postings),
+            key=len
+        )
+        candidates: Set[int] = set()
+        for posting in postings:
+            if candidates and len(candidates) + len(posting) > self.max_candidates:
+                break
+            candidates.update(posting)
+        return heapq.nlargest(
+            k,
+            ((item_id, _packed_cosine(vector, self._vectors[item_id])) for item_id in candidates),
+            key=lambda hit: hit[1]
+        )
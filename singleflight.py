@@ -0,0 +1,43 @@
+"""Single-flight: concurrent calls with the same key share one execution"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    The first caller for a key starts `fn` as its own task; callers arriving
+    while it runs await the same task. The task is shielded, so one caller
+    going away (client disconnect) does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[T]"] = {}
+        self.shared = 0  # calls answered by another caller's execution
+
+    @property
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return (result, shared) where shared is True if another call did the work"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Nobody may be left to await a failed task; mark the exception as seen
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,685 @@
+"""Storage backends for claim history and background jobs
+
+Memory and JobQueue keep their logic (caching, matching, scheduling) and
+leave persistence to a backend object with this interface:
+
+    connect() / close()          open and close pooled connections
+    migrate()                    bring the schema up to date
+    get_claim(claim_hash)        row for an exact match, or None
+    get_claims(ids)              {id: row}
+    lsh_candidates(buckets, n)   [{id, claim_text, normalized_claim}] sharing most LSH buckets
+    upsert_claims(records)       bulk insert-or-update in one transaction; ids in input order
+    export_claims(batch_size)    async batches of stored claims (for copying between backends)
+    load_embeddings(embed, n)    async batches of (id, vector blob), backfilling missing vectors
+    change_marker()              position in the claim change feed, for poll_changes
+    poll_changes(marker, ...)    (id, claim_hash, vector blob) of claims written since `marker`
+    claim_counters()             trigger-maintained counters
+    init_jobs() ... set_callback_status()   the job queue's table
+
+Rows are dicts of MATCH_COLUMNS with `result` decoded. SQLiteStorage is
+the default; PostgresStorage (storage_pg.py, needs asyncpg) lets several
+nodes share one database with concurrent writers.
+"""
+import aiosqlite
+import asyncio
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import claim_index
+import jsonutil
+
+# Job lifecycle (jobs.py)
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Columns returned for a match (everything except the embedding)
+MATCH_COLUMNS = (
+    "id, claim_hash, claim_text, normalized_claim, verdict, confidence, "
+    "risk_level, topic, created_at, updated_at, result"
+)
+
+# Applied to every pooled connection
+_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 134217728",
+]
+
+# BEGIN IMMEDIATE attempts (each waits up to busy_timeout) before a write gives up
+_WRITE_RETRIES = 6
+
+# Bound parameters per IN (...) query, under SQLite's default limit
+_CHUNK = 500
+
+
+def _bump(name: str, delta: int) -> str:
+    return (
+        f"INSERT INTO claim_stats (name, value) VALUES ({name}, {delta}) "
+        f"ON CONFLICT(name) DO UPDATE SET value = value + {delta};"
+    )
+
+
+_STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS claims_stats_insert AFTER INSERT ON claims BEGIN
+        {_bump("'total'", 1)}
+        {_bump("'verdict:' || COALESCE(NEW.verdict, '')", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS claims_stats_update AFTER UPDATE OF verdict ON claims
+    WHEN OLD.verdict IS NOT NEW.verdict BEGIN
+        {_bump("'verdict:' || COALESCE(OLD.verdict, '')", -1)}
+        {_bump("'verdict:' || COALESCE(NEW.verdict, '')", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS claims_stats_delete AFTER DELETE ON claims BEGIN
+        {_bump("'total'", -1)}
+        {_bump("'verdict:' || COALESCE(OLD.verdict, '')", -1)}
+    END
+    """,
+]
+
+
+def compress(payload: Dict[str, Any]) -> bytes:
+    return zlib.compress(jsonutil.dumpb(payload), 6)
+
+
+def decompress(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    return jsonutil.loads(zlib.decompress(blob)) if blob else None
+
+
+def _epoch(iso: Optional[str]) -> int:
+    """Seconds since the epoch for a stored ISO timestamp (naive values are UTC)"""
+    try:
+        stamp = datetime.fromisoformat(iso)
+    except (TypeError, ValueError):
+        return int(time.time())
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return int(stamp.timestamp())
+
+
+def dedupe(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Last record per claim_hash, in hash order (a stable lock order for concurrent writers)"""
+    latest = {record["claim_hash"]: record for record in records}
+    return {claim_hash: latest[claim_hash] for claim_hash in sorted(latest)}
+
+
+def _chunks(items: List[Any], size: int = _CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteStorage:
+    """aiosqlite, one writer connection and a pool of read-only ones (WAL)"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, read_pool_size: int = 4):
+        self.path = path
+        self.read_pool_size = read_pool_size
+
+        # Long-lived connections: one writer, a pool of readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: List[aiosqlite.Connection] = []
+        self._read_pool: Optional[asyncio.Queue] = None
+        self._connect_lock = asyncio.Lock()
+
+        # Other worker processes write to the same file; PRAGMA data_version
+        # (per reader connection) reveals their commits
+        self._data_versions: Dict[int, int] = {}
+
+    @property
+    def _in_memory(self) -> bool:
+        # Each connection to :memory: is a separate database, so everything uses the writer
+        return self.path in ("", ":memory:")
+
+    async def _open(self, read_only: bool = False) -> aiosqlite.Connection:
+        db = aiosqlite.connect(self.path)
+        # Pooled connections live for the whole process; don't block interpreter exit
+        db.daemon = True
+        await db
+        db.row_factory = aiosqlite.Row
+        pragmas = _PRAGMAS + (["PRAGMA query_only = ON"] if read_only else [])
+        for pragma in pragmas:
+            # Close each cursor so no statement keeps a lock open
+            async with db.execute(pragma) as cursor:
+                await cursor.fetchall()
+        return db
+
+    async def connect(self):
+        """Open the writer and reader pool (idempotent)"""
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+
+            writer = await self._open()
+            if not self._in_memory:
+                async with writer.execute("PRAGMA journal_mode = WAL") as cursor:
+                    await cursor.fetchall()
+
+            readers = []
+            if not self._in_memory:
+                readers = [await self._open(read_only=True) for _ in range(self.read_pool_size)]
+            for reader in readers:
+                async with reader.execute("PRAGMA data_version") as cursor:
+                    (self._data_versions[id(reader)],) = await cursor.fetchone()
+            pool: asyncio.Queue = asyncio.Queue()
+            for reader in readers:
+                pool.put_nowait(reader)
+
+            self._writer, self._readers, self._read_pool = writer, readers, pool
+
+    async def close(self):
+        """Close all pooled connections"""
+        async with self._connect_lock:
+            for db in self._readers:
+                await db.close()
+            if self._writer is not None:
+                await self._writer.close()
+            self._writer, self._readers, self._read_pool = None, [], None
+            self._data_versions.clear()
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read-only connection from the pool"""
+        if self._writer is None:
+            await self.connect()
+        if not self._readers:
+            async with self._write_lock:
+                yield self._writer
+            return
+
+        db = await self._read_pool.get()
+        try:
+            yield db
+        finally:
+            self._read_pool.put_nowait(db)
+
+    async def _begin_immediate(self, db: aiosqlite.Connection):
+        """
+        Take the database write lock up front. A deferred transaction that reads
+        first can fail with SQLITE_BUSY when another process commits in between;
+        an immediate one just waits (busy_timeout), retried here for long waits.
+        """
+        for attempt in range(_WRITE_RETRIES):
+            try:
+                await db.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                if attempt == _WRITE_RETRIES - 1:
+                    raise
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Exclusive access to the single writer; commits on success, rolls back on error"""
+        if self._writer is None:
+            await self.connect()
+        async with self._write_lock:
+            await self._begin_immediate(self._writer)
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    # ---- schema ----
+
+    async def migrate(self):
+        """Bring the schema up to date; PRAGMA user_version counts the migrations applied"""
+        async with self.writer() as db:
+            async with db.execute("PRAGMA user_version") as cursor:
+                (version,) = await cursor.fetchone()
+            for target in range(version + 1, len(self._MIGRATIONS) + 1):
+                print(f"Memory: migrating schema to v{target}")
+                await self._MIGRATIONS[target - 1](self, db)
+                await db.execute(f"PRAGMA user_version = {target}")
+
+    async def _migrate_v1(self, db: aiosqlite.Connection):
+        """Original schema: claims with JSON text columns, plus LSH buckets"""
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS claims (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                claim_hash TEXT UNIQUE,
+                claim_text TEXT,
+                normalized_claim TEXT,
+                verdict TEXT,
+                confidence INTEGER,
+                risk_level TEXT,
+                topic TEXT,
+                evidence_for TEXT,
+                evidence_against TEXT,
+                actions_taken TEXT,
+                timestamp TEXT,
+                json_blob TEXT
+            )
+        """)
+        # Unversioned databases may predate json_blob / embedding
+        cursor = await db.execute("PRAGMA table_info(claims)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if "json_blob" not in columns:
+            await db.execute("ALTER TABLE claims ADD COLUMN json_blob TEXT")
+        if "embedding" not in columns:
+            await db.execute("ALTER TABLE claims ADD COLUMN embedding BLOB")
+
+        # LSH buckets for near-duplicate candidate retrieval
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS claim_lsh (
+                bucket INTEGER NOT NULL,
+                claim_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, claim_id)
+            ) WITHOUT ROWID
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_claim_lsh_claim ON claim_lsh(claim_id)"
+        )
+
+        # Backfill buckets for claims stored before the index existed
+        cursor = await db.execute("""
+            SELECT id, normalized_claim FROM claims
+            WHERE id NOT IN (SELECT claim_id FROM claim_lsh)
+        """)
+        for claim_id, normalized in await cursor.fetchall():
+            await db.executemany(
+                "INSERT OR IGNORE INTO claim_lsh (bucket, claim_id) VALUES (?, ?)",
+                [(bucket, claim_id) for bucket in claim_index.bucket_keys(normalized or "")]
+            )
+
+    async def _migrate_v2(self, db: aiosqlite.Connection):
+        """
+        Integer timestamps, compressed result blobs (evidence included),
+        indexes for verdict/topic/time, trigger-maintained counters
+        """
+        await db.execute("""
+            CREATE TABLE claims_v2 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                claim_hash TEXT NOT NULL UNIQUE,
+                claim_text TEXT NOT NULL,
+                normalized_claim TEXT NOT NULL,
+                verdict TEXT,
+                confidence INTEGER,
+                risk_level TEXT,
+                topic TEXT,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                result BLOB,
+                embedding BLOB
+            )
+        """)
+        cursor = await db.execute("""
+            SELECT id, claim_hash, claim_text, normalized_claim, verdict, confidence,
+                   risk_level, topic, timestamp,
+                   json_blob, embedding
+            FROM claims
+        """)
+        while True:
+            rows = await cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                stamp = _epoch(row["timestamp"])
+                await db.execute("""
+                    INSERT INTO claims_v2
+                    (id, claim_hash, claim_text, normalized_claim, verdict, confidence,
+                     risk_level, topic, created_at, updated_at, result, embedding)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    row["id"], row["claim_hash"], row["claim_text"] or "",
+                    row["normalized_claim"] or "", row["verdict"], row["confidence"],
+                    row["risk_level"], row["topic"], stamp, stamp,
+                    compress(json.loads(row["json_blob"])) if row["json_blob"] else None,
+                    row["embedding"]
+                ))
+
+        await db.execute("DROP TABLE claims")
+        await db.execute("ALTER TABLE claims_v2 RENAME TO claims")
+        await db.execute("CREATE INDEX idx_claims_updated ON claims(updated_at)")
+        await db.execute("CREATE INDEX idx_claims_verdict ON claims(verdict, updated_at)")
+        await db.execute("CREATE INDEX idx_claims_topic ON claims(topic, updated_at)")
+
+        # Counters kept current by triggers, so stats never scan claims
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS claim_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        await db.execute("DELETE FROM claim_stats")
+        await db.execute("INSERT INTO claim_stats SELECT 'total', COUNT(*) FROM claims")
+        await db.execute("""
+            INSERT INTO claim_stats
+            SELECT 'verdict:' || COALESCE(verdict, ''), COUNT(*) FROM claims GROUP BY verdict
+        """)
+        for statement in _STATS_TRIGGERS:
+            await db.execute(statement)
+
+    async def _migrate_v3(self, db: aiosqlite.Connection):
+        """Change feed: every upsert stamps its rows with the next version"""
+        await db.execute("ALTER TABLE claims ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        await db.execute("UPDATE claims SET version = id")
+        await db.execute("CREATE INDEX idx_claims_version ON claims(version)")
+
+    async def _migrate_v4(self, db: aiosqlite.Connection):
+        """Vectors gained word-order features: load_embeddings re-embeds every claim"""
+        await db.execute("UPDATE claims SET embedding = NULL")
+
+    async def _migrate_v5(self, db: aiosqlite.Connection):
+        """Evidence lives in the result blob only: drop the unread copy in sources/claim_sources"""
+        await db.execute("DROP TABLE IF EXISTS claim_sources")
+        await db.execute("DROP TABLE IF EXISTS sources")
+
+    _MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4, _migrate_v5]
+
+    # ---- claims ----
+
+    @staticmethod
+    def _row(row: aiosqlite.Row) -> Dict[str, Any]:
+        match = dict(row)
+        match["result"] = decompress(match["result"])
+        return match
+
+    async def get_claim(self, claim_hash: str) -> Optional[Dict[str, Any]]:
+        async with self.reader() as db:
+            cursor = await db.execute(
+                f"SELECT {MATCH_COLUMNS} FROM claims WHERE claim_hash = ?", (claim_hash,)
+            )
+            row = await cursor.fetchone()
+        return self._row(row) if row else None
+
+    async def get_claims(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        async with self.reader() as db:
+            cursor = await db.execute(
+                f"SELECT {MATCH_COLUMNS} FROM claims WHERE id IN ({placeholders})", list(ids)
+            )
+            rows = await cursor.fetchall()
+        return {row["id"]: self._row(row) for row in rows}
+
+    async def lsh_candidates(self, buckets: List[int], limit: int) -> List[Dict[str, Any]]:
+        """Claims sharing at least one bucket, most shared bands first (text columns only)"""
+        placeholders = ",".join("?" * len(buckets))
+        async with self.reader() as db:
+            cursor = await db.execute(f"""
+                SELECT claims.id, claims.claim_text, claims.normalized_claim FROM claims
+                JOIN (
+                    SELECT claim_id, COUNT(*) AS shared
+                    FROM claim_lsh
+                    WHERE bucket IN ({placeholders})
+                    GROUP BY claim_id
+                    ORDER BY shared DESC
+                    LIMIT ?
+                ) AS candidates ON candidates.claim_id = claims.id
+            """, (*buckets, limit))
+            return [dict(row) for row in await cursor.fetchall()]
+
+    async def upsert_claims(self, records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Insert or update claims in one transaction. Each record has the claim
+        columns plus `result` (dict), `embedding` (bytes or None), `buckets`
+        and optional created_at/updated_at.
+        """
+        unique = dedupe(records)
+        now = int(time.time())
+        async with self.writer() as db:
+            # Writers are serialized, so versions grow in commit order
+            async with db.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM claims") as cursor:
+                (version,) = await cursor.fetchone()
+            # Upsert keeps row ids stable so LSH buckets can be rewritten in place
+            await db.executemany("""
+                INSERT INTO claims
+                (claim_hash, claim_text, normalized_claim, verdict, confidence,
+                 risk_level, topic, created_at, updated_at, result, embedding, version)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(claim_hash) DO UPDATE SET
+                    claim_text = excluded.claim_text,
+                    normalized_claim = excluded.normalized_claim,
+                    verdict = excluded.verdict,
+                    confidence = excluded.confidence,
+                    risk_level = excluded.risk_level,
+                    topic = excluded.topic,
+                    updated_at = excluded.updated_at,
+                    result = excluded.result,
+                    embedding = excluded.embedding,
+                    version = excluded.version
+            """, [
+                (
+                    r["claim_hash"], r["claim_text"], r["normalized_claim"], r.get("verdict"),
+                    r.get("confidence"), r.get("risk_level"), r.get("topic"),
+                    r.get("created_at") or now, r.get("updated_at") or now,
+                    compress(r["result"]), r.get("embedding"), version
+                )
+                for r in unique.values()
+            ])
+
+            ids: Dict[str, int] = {}
+            for chunk in _chunks(list(unique)):
+                cursor = await db.execute(
+                    f"SELECT claim_hash, id FROM claims WHERE claim_hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                ids.update({claim_hash: claim_id for claim_hash, claim_id in await cursor.fetchall()})
+
+            await db.executemany(
+                "DELETE FROM claim_lsh WHERE claim_id = ?", [(claim_id,) for claim_id in ids.values()]
+            )
+            await db.executemany(
+                "INSERT OR IGNORE INTO claim_lsh (bucket, claim_id) VALUES (?, ?)",
+                [(bucket, ids[h]) for h, r in unique.items() for bucket in r["buckets"]]
+            )
+        return [ids[record["claim_hash"]] for record in records]
+
+    async def export_claims(self, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stored claims in id order: claim_text, result, created_at, updated_at"""
+        last_id = 0
+        while True:
+            async with self.reader() as db:
+                cursor = await db.execute("""
+                    SELECT id, claim_text, result, created_at, updated_at FROM claims
+                    WHERE id > ? AND result IS NOT NULL ORDER BY id LIMIT ?
+                """, (last_id, batch_size))
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [self._row(row) for row in rows]
+
+    async def load_embeddings(
+        self, embed: Callable[[str], bytes], batch_size: int = 500
+    ) -> AsyncIterator[List[Tuple[int, bytes]]]:
+        """
+        Every claim's vector blob in id order, in batches read from the pool.
+        Rows stored without one are embedded and saved per batch, so writers
+        only ever wait for one short transaction.
+        """
+        last_id = 0
+        while True:
+            async with self.reader() as db:
+                cursor = await db.execute(
+                    "SELECT id, claim_text, embedding FROM claims WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                rows = await cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            vectors, missing = [], []
+            for claim_id, claim_text, blob in rows:
+                if blob is None:
+                    blob = embed(claim_text or "")
+                    missing.append((blob, claim_id))
+                vectors.append((claim_id, blob))
+            if missing:
+                async with self.writer() as db:
+                    # A claim rewritten meanwhile already has its new vector
+                    await db.executemany(
+                        "UPDATE claims SET embedding = ? WHERE id = ? AND embedding IS NULL", missing
+                    )
+            yield vectors
+
+    async def change_marker(self) -> Any:
+        """The highest claim version stored so far"""
+        async with self.reader() as db:
+            async with db.execute("SELECT COALESCE(MAX(version), 0) FROM claims") as cursor:
+                (marker,) = await cursor.fetchone()
+        return marker
+
+    async def poll_changes(
+        self, marker: Any, with_vectors: bool
+    ) -> Tuple[bool, List[Tuple[int, str, Optional[bytes]]], Any]:
+        """
+        (changed since the last poll, [(id, claim_hash, vector blob or None)]
+        of claims written after `marker`, new marker)
+        """
+        if not self._readers:
+            return False, [], marker
+        async with self.reader() as db:
+            # Cheap check first: has anyone committed to the file since this connection last looked?
+            async with db.execute("PRAGMA data_version") as cursor:
+                (data_version,) = await cursor.fetchone()
+            if self._data_versions.get(id(db)) == data_version:
+                return False, [], marker
+            self._data_versions[id(db)] = data_version
+
+            cursor = await db.execute(f"""
+                SELECT id, claim_hash, {"embedding" if with_vectors else "NULL"}, version
+                FROM claims WHERE version > ?
+            """, (marker or 0,))
+            rows = await cursor.fetchall()
+        changes = [(claim_id, claim_hash, blob) for claim_id, claim_hash, blob, _ in rows]
+        return True, changes, max([marker or 0] + [row[3] for row in rows])
+
+    async def claim_counters(self) -> Dict[str, int]:
+        async with self.reader() as db:
+            cursor = await db.execute("SELECT name, value FROM claim_stats")
+            return {name: value for name, value in await cursor.fetchall()}
+
+    # ---- jobs ----
+
+    async def init_jobs(self):
+        async with self.writer() as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    claim TEXT NOT NULL,
+                    context TEXT,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    callback_url TEXT,
+                    callback_status TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            # Tables created before leases existed
+            cursor = await db.execute("PRAGMA table_info(jobs)")
+            if "lease_until" not in {row[1] for row in await cursor.fetchall()}:
+                await db.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, created_at)"
+            )
+
+    async def insert_job(self, job: Dict[str, Any]):
+        async with self.writer() as db:
+            await db.execute("""
+                INSERT INTO jobs (id, claim, context, priority, status, callback_url, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                job["id"], job["claim"], job["context"], job["priority"],
+                job["status"], job["callback_url"], job["created_at"]
+            ))
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        async with self.reader() as db:
+            cursor = await db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = await cursor.fetchone()
+        return dict(row) if row else None
+
+    async def job_counts(self) -> Dict[str, int]:
+        async with self.reader() as db:
+            cursor = await db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def purge_jobs(self, before: float):
+        async with self.writer() as db:
+            await db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, before)
+            )
+
+    async def claim_job(self, now: float, lease: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(jobs requeued from expired leases, next job now 'running' or None)"""
+        async with self.writer() as db:
+            cursor = await db.execute("""
+                UPDATE jobs SET status = ?, started_at = NULL
+                WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)
+            """, (QUEUED, RUNNING, now))
+            requeued = cursor.rowcount
+            cursor = await db.execute("""
+                SELECT id, claim, context, callback_url FROM jobs
+                WHERE status = ?
+                ORDER BY priority, created_at
+                LIMIT 1
+            """, (QUEUED,))
+            row = await cursor.fetchone()
+            if row is None:
+                return requeued, None
+            await db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, now, now + lease, row["id"])
+            )
+        return requeued, dict(row)
+
+    async def renew_job(self, job_id: str, lease_until: float):
+        async with self.writer() as db:
+            await db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?", (lease_until, job_id, RUNNING)
+            )
+
+    async def finish_job(
+        self, job_id: str, status: str, result: Optional[str], error: Optional[str], finished_at: float
+    ):
+        async with self.writer() as db:
+            await db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                (status, result, error, finished_at, job_id)
+            )
+
+    async def requeue_jobs(self, job_ids: List[str]):
+        async with self.writer() as db:
+            await db.executemany(
+                "UPDATE jobs SET status = ?, started_at = NULL, lease_until = NULL WHERE id = ? AND status = ?",
+                [(QUEUED, job_id, RUNNING) for job_id in job_ids]
+            )
+
+    async def set_callback_status(self, job_id: str, outcome: str):
+        async with self.writer() as db:
+            await db.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (outcome, job_id))
+
+
+def make_storage(url: str = "", path: str = "", read_pool_size: int = 4, pool_size: int = 10):
+    """SQLite at `path` unless `url` is a postgres:// / postgresql:// URL"""
+    if url.startswith(("postgres://", "postgresql://")):
+        # Imported here so asyncpg is only needed when Postgres is configured
+        from storage_pg import PostgresStorage
+        return PostgresStorage(url, pool_size=pool_size)
+    if url:
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {url.split(':', 1)[0]}")
+    return SQLiteStorage(path, read_pool_size=read_pool_size)
@@ -0,0 +1,451 @@
+"""PostgreSQL storage backend (asyncpg): one database shared by every node, with concurrent writers
+
+Same interface as storage.SQLiteStorage. Writes are ordinary transactions,
+so nodes write in parallel; bulk upserts go through unnest() arrays, one
+statement per table. Job workers claim rows with FOR UPDATE SKIP LOCKED.
+Timestamps written here come from the database clock, so nodes with
+skewed clocks still agree on what changed when.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import asyncpg
+
+from storage import DONE, FAILED, MATCH_COLUMNS, QUEUED, RUNNING, compress, decompress, dedupe
+
+T = TypeVar("T")
+
+# Serializes schema changes when several nodes start at once (arbitrary key)
+_SCHEMA_LOCK = 7_146_920_113
+
+# Held from stamping a write's change-feed version until it commits, so
+# versions become visible in order and a poll never skips a late commit
+_VERSION_LOCK = 7_146_920_114
+
+# Write transactions retried after a deadlock or serialization failure
+_WRITE_RETRIES = 4
+
+_NOW = "EXTRACT(EPOCH FROM now())::bigint"
+
+_SCHEMA_V1 = [
+    """
+    CREATE TABLE claims (
+        id BIGSERIAL PRIMARY KEY,
+        claim_hash TEXT NOT NULL UNIQUE,
+        claim_text TEXT NOT NULL,
+        normalized_claim TEXT NOT NULL,
+        verdict TEXT,
+        confidence INTEGER,
+        risk_level TEXT,
+        topic TEXT,
+        created_at BIGINT NOT NULL,
+        updated_at BIGINT NOT NULL,
+        result BYTEA,
+        embedding BYTEA
+    )
+    """,
+    "CREATE INDEX idx_claims_updated ON claims(updated_at)",
+    "CREATE INDEX idx_claims_verdict ON claims(verdict, updated_at)",
+    "CREATE INDEX idx_claims_topic ON claims(topic, updated_at)",
+    """
+    CREATE TABLE claim_lsh (
+        bucket BIGINT NOT NULL,
+        claim_id BIGINT NOT NULL,
+        PRIMARY KEY (bucket, claim_id)
+    )
+    """,
+    "CREATE INDEX idx_claim_lsh_claim ON claim_lsh(claim_id)",
+    # Counters kept current by a trigger, so stats never scan claims
+    "CREATE TABLE claim_stats (name TEXT PRIMARY KEY, value BIGINT NOT NULL)",
+    """
+    CREATE FUNCTION claim_stats_bump(stat TEXT, delta BIGINT) RETURNS void AS $$
+        INSERT INTO claim_stats (name, value) VALUES (stat, delta)
+        ON CONFLICT (name) DO UPDATE SET value = claim_stats.value + delta
+    $$ LANGUAGE sql
+    """,
+    """
+    CREATE FUNCTION claims_stats_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM claim_stats_bump('total', 1);
+            PERFORM claim_stats_bump('verdict:' || COALESCE(NEW.verdict, ''), 1);
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM claim_stats_bump('total', -1);
+            PERFORM claim_stats_bump('verdict:' || COALESCE(OLD.verdict, ''), -1);
+        ELSIF OLD.verdict IS DISTINCT FROM NEW.verdict THEN
+            PERFORM claim_stats_bump('verdict:' || COALESCE(OLD.verdict, ''), -1);
+            PERFORM claim_stats_bump('verdict:' || COALESCE(NEW.verdict, ''), 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER claims_stats AFTER INSERT OR DELETE OR UPDATE OF verdict ON claims
+    FOR EACH ROW EXECUTE FUNCTION claims_stats_trigger()
+    """,
+]
+
+# Change feed: every upsert stamps its rows from a sequence (updated_at has
+# one-second resolution, so it cannot tell two writes in one second apart)
+_SCHEMA_V2 = [
+    "CREATE SEQUENCE claims_version_seq",
+    "ALTER TABLE claims ADD COLUMN version BIGINT NOT NULL DEFAULT 0",
+    "UPDATE claims SET version = nextval('claims_version_seq')",
+    "CREATE INDEX idx_claims_version ON claims(version)",
+]
+
+# Counter shards: each connection bumps its own row of a counter, so
+# concurrent inserts do not all queue on one 'total' row; reads sum them
+_STAT_SHARDS = 16
+
+_SCHEMA_V3 = [
+    "ALTER TABLE claim_stats ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0",
+    "ALTER TABLE claim_stats DROP CONSTRAINT claim_stats_pkey",
+    "ALTER TABLE claim_stats ADD PRIMARY KEY (name, shard)",
+    f"""
+    CREATE OR REPLACE FUNCTION claim_stats_bump(stat TEXT, delta BIGINT) RETURNS void AS $$
+        INSERT INTO claim_stats (name, shard, value)
+        VALUES (stat, pg_backend_pid() % {_STAT_SHARDS}, delta)
+        ON CONFLICT (name, shard) DO UPDATE SET value = claim_stats.value + delta
+    $$ LANGUAGE sql
+    """,
+]
+
+# Vectors gained word-order features: load_embeddings re-embeds every claim
+_SCHEMA_V4 = ["UPDATE claims SET embedding = NULL"]
+
+# Evidence lives in the result blob only: drop the unread copy (databases created before v5)
+_SCHEMA_V5 = ["DROP TABLE IF EXISTS claim_sources", "DROP TABLE IF EXISTS sources"]
+
+_MIGRATIONS = [_SCHEMA_V1, _SCHEMA_V2, _SCHEMA_V3, _SCHEMA_V4, _SCHEMA_V5]
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _claim(row: asyncpg.Record) -> Dict[str, Any]:
+    match = dict(row)
+    match["result"] = decompress(match["result"])
+    return match
+
+
+class PostgresStorage:
+    """asyncpg connection pool; schema versions in a schema_version table"""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, pool_size: int = 10):
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self._pool: Optional[asyncpg.Pool] = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        """Open the connection pool (idempotent)"""
+        async with self._connect_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    self.dsn, min_size=1, max_size=max(1, self.pool_size)
+                )
+
+    async def close(self):
+        async with self._connect_lock:
+            if self._pool is not None:
+                await self._pool.close()
+                self._pool = None
+
+    @asynccontextmanager
+    async def _conn(self) -> AsyncIterator[asyncpg.Connection]:
+        if self._pool is None:
+            await self.connect()
+        async with self._pool.acquire() as conn:
+            yield conn
+
+    async def _write(self, fn: Callable[[asyncpg.Connection], Awaitable[T]]) -> T:
+        """Run fn in a transaction, retrying when Postgres aborts it to break a deadlock"""
+        for attempt in range(_WRITE_RETRIES):
+            try:
+                async with self._conn() as conn:
+                    async with conn.transaction():
+                        return await fn(conn)
+            except (asyncpg.exceptions.DeadlockDetectedError, asyncpg.exceptions.SerializationError):
+                if attempt == _WRITE_RETRIES - 1:
+                    raise
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+    # ---- schema ----
+
+    async def migrate(self):
+        async def apply(conn: asyncpg.Connection):
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _SCHEMA_LOCK)
+            await conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+            version = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            for target in range(version + 1, len(_MIGRATIONS) + 1):
+                print(f"Memory: migrating Postgres schema to v{target}")
+                for statement in _MIGRATIONS[target - 1]:
+                    await conn.execute(statement)
+                await conn.execute("INSERT INTO schema_version (version) VALUES ($1)", target)
+        await self._write(apply)
+
+    # ---- claims ----
+
+    async def get_claim(self, claim_hash: str) -> Optional[Dict[str, Any]]:
+        async with self._conn() as conn:
+            row = await conn.fetchrow(f"SELECT {MATCH_COLUMNS} FROM claims WHERE claim_hash = $1", claim_hash)
+        return _claim(row) if row else None
+
+    async def get_claims(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        async with self._conn() as conn:
+            rows = await conn.fetch(f"SELECT {MATCH_COLUMNS} FROM claims WHERE id = ANY($1::bigint[])", list(ids))
+        return {row["id"]: _claim(row) for row in rows}
+
+    async def lsh_candidates(self, buckets: List[int], limit: int) -> List[Dict[str, Any]]:
+        async with self._conn() as conn:
+            rows = await conn.fetch("""
+                SELECT claims.id, claims.claim_text, claims.normalized_claim FROM claims
+                JOIN (
+                    SELECT claim_id, COUNT(*) AS shared
+                    FROM claim_lsh
+                    WHERE bucket = ANY($1::bigint[])
+                    GROUP BY claim_id
+                    ORDER BY shared DESC
+                    LIMIT $2
+                ) AS candidates ON candidates.claim_id = claims.id
+            """, buckets, limit)
+        return [dict(row) for row in rows]
+
+    async def upsert_claims(self, records: List[Dict[str, Any]]) -> List[int]:
+        """Insert or update claims in one transaction, one statement per table"""
+        unique = list(dedupe(records).values())
+
+        async def write(conn: asyncpg.Connection) -> Dict[str, int]:
+            rows = await conn.fetch(f"""
+                INSERT INTO claims
+                (claim_hash, claim_text, normalized_claim, verdict, confidence,
+                 risk_level, topic, created_at, updated_at, result, embedding)
+                SELECT h, t, n, v, c, r, tp, COALESCE(ca, {_NOW}), COALESCE(ua, {_NOW}), res, e
+                FROM unnest(
+                    $1::text[], $2::text[], $3::text[], $4::text[], $5::int[], $6::text[],
+                    $7::text[], $8::bigint[], $9::bigint[], $10::bytea[], $11::bytea[]
+                ) AS u(h, t, n, v, c, r, tp, ca, ua, res, e)
+                ON CONFLICT (claim_hash) DO UPDATE SET
+                    claim_text = EXCLUDED.claim_text,
+                    normalized_claim = EXCLUDED.normalized_claim,
+                    verdict = EXCLUDED.verdict,
+                    confidence = EXCLUDED.confidence,
+                    risk_level = EXCLUDED.risk_level,
+                    topic = EXCLUDED.topic,
+                    updated_at = EXCLUDED.updated_at,
+                    result = EXCLUDED.result,
+                    embedding = EXCLUDED.embedding
+                RETURNING claim_hash, id
+            """,
+                [r["claim_hash"] for r in unique],
+                [r["claim_text"] for r in unique],
+                [r["normalized_claim"] for r in unique],
+                [r.get("verdict") for r in unique],
+                [_as_int(r.get("confidence")) for r in unique],
+                [r.get("risk_level") for r in unique],
+                [r.get("topic") for r in unique],
+                [r.get("created_at") for r in unique],
+                [r.get("updated_at") for r in unique],
+                [compress(r["result"]) for r in unique],
+                [r.get("embedding") for r in unique],
+            )
+            ids = {row["claim_hash"]: row["id"] for row in rows}
+            claim_ids = [ids[r["claim_hash"]] for r in unique]
+
+            await conn.execute("DELETE FROM claim_lsh WHERE claim_id = ANY($1::bigint[])", claim_ids)
+            lsh = [(bucket, ids[r["claim_hash"]]) for r in unique for bucket in r["buckets"]]
+            await conn.execute("""
+                INSERT INTO claim_lsh (bucket, claim_id)
+                SELECT * FROM unnest($1::bigint[], $2::bigint[])
+                ON CONFLICT DO NOTHING
+            """, [b for b, _ in lsh], [c for _, c in lsh])
+
+            # Last statement before commit: the lock is held only for the stamp and the commit
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _VERSION_LOCK)
+            await conn.execute(
+                "UPDATE claims SET version = nextval('claims_version_seq') WHERE id = ANY($1::bigint[])",
+                claim_ids
+            )
+            return ids
+
+        ids = await self._write(write)
+        return [ids[record["claim_hash"]] for record in records]
+
+    async def export_claims(self, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        last_id = 0
+        while True:
+            async with self._conn() as conn:
+                rows = await conn.fetch("""
+                    SELECT id, claim_text, result, created_at, updated_at FROM claims
+                    WHERE id > $1 AND result IS NOT NULL ORDER BY id LIMIT $2
+                """, last_id, batch_size)
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [_claim(row) for row in rows]
+
+    async def _marker(self, conn: asyncpg.Connection) -> int:
+        # Highest change-feed version (indexed); every upsert raises it
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM claims")
+
+    async def load_embeddings(
+        self, embed: Callable[[str], bytes], batch_size: int = 500
+    ) -> AsyncIterator[List[Tuple[int, bytes]]]:
+        last_id = 0
+        while True:
+            async with self._conn() as conn:
+                rows = await conn.fetch(
+                    "SELECT id, claim_text, embedding FROM claims WHERE id > $1 ORDER BY id LIMIT $2",
+                    last_id, batch_size
+                )
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            vectors, missing = [], []
+            for row in rows:
+                blob = row["embedding"]
+                if blob is None:
+                    blob = embed(row["claim_text"] or "")
+                    missing.append((blob, row["id"]))
+                vectors.append((row["id"], blob))
+            if missing:
+                await self._write(lambda conn: conn.executemany(
+                    "UPDATE claims SET embedding = $1 WHERE id = $2 AND embedding IS NULL", missing
+                ))
+            yield vectors
+
+    async def change_marker(self) -> Any:
+        async with self._conn() as conn:
+            return await self._marker(conn)
+
+    async def poll_changes(
+        self, marker: Any, with_vectors: bool
+    ) -> Tuple[bool, List[Tuple[int, str, Optional[bytes]]], Any]:
+        async with self._conn() as conn:
+            current = await self._marker(conn)
+            if current == marker:
+                return False, [], marker
+            rows = await conn.fetch(f"""
+                SELECT id, claim_hash, {"embedding" if with_vectors else "NULL::bytea"} AS embedding
+                FROM claims WHERE version > $1 AND version <= $2
+            """, marker or 0, current)
+        return True, [(row["id"], row["claim_hash"], row["embedding"]) for row in rows], current
+
+    async def claim_counters(self) -> Dict[str, int]:
+        async with self._conn() as conn:
+            rows = await conn.fetch("SELECT name, SUM(value)::bigint AS value FROM claim_stats GROUP BY name")
+        return {row["name"]: row["value"] for row in rows}
+
+    # ---- jobs ----
+
+    async def init_jobs(self):
+        async def create(conn: asyncpg.Connection):
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _SCHEMA_LOCK)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    claim TEXT NOT NULL,
+                    context TEXT,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    callback_url TEXT,
+                    callback_status TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at DOUBLE PRECISION NOT NULL,
+                    started_at DOUBLE PRECISION,
+                    finished_at DOUBLE PRECISION,
+                    lease_until DOUBLE PRECISION
+                )
+            """)
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority, created_at)"
+            )
+        await self._write(create)
+
+    async def insert_job(self, job: Dict[str, Any]):
+        async with self._conn() as conn:
+            await conn.execute("""
+                INSERT INTO jobs (id, claim, context, priority, status, callback_url, created_at)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+            """, job["id"], job["claim"], job["context"], job["priority"],
+                job["status"], job["callback_url"], job["created_at"])
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        async with self._conn() as conn:
+            row = await conn.fetchrow("SELECT * FROM jobs WHERE id = $1", job_id)
+        return dict(row) if row else None
+
+    async def job_counts(self) -> Dict[str, int]:
+        async with self._conn() as conn:
+            rows = await conn.fetch("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    async def purge_jobs(self, before: float):
+        async with self._conn() as conn:
+            await conn.execute(
+                "DELETE FROM jobs WHERE status IN ($1, $2) AND finished_at < $3", DONE, FAILED, before
+            )
+
+    async def claim_job(self, now: float, lease: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Each statement is atomic on its own; SKIP LOCKED lets workers on every node claim in parallel"""
+        async with self._conn() as conn:
+            status = await conn.execute("""
+                UPDATE jobs SET status = $1, started_at = NULL
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE status = $2 AND (lease_until IS NULL OR lease_until < $3)
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, QUEUED, RUNNING, now)
+            row = await conn.fetchrow("""
+                UPDATE jobs SET status = $1, started_at = $2, lease_until = $3, attempts = attempts + 1
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = $4
+                    ORDER BY priority, created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, claim, context, callback_url
+            """, RUNNING, now, now + lease, QUEUED)
+        # execute() returns the command tag, e.g. "UPDATE 2"
+        return int(status.split()[-1]), dict(row) if row else None
+
+    async def renew_job(self, job_id: str, lease_until: float):
+        async with self._conn() as conn:
+            await conn.execute(
+                "UPDATE jobs SET lease_until = $1 WHERE id = $2 AND status = $3", lease_until, job_id, RUNNING
+            )
+
+    async def finish_job(
+        self, job_id: str, status: str, result: Optional[str], error: Optional[str], finished_at: float
+    ):
+        async with self._conn() as conn:
+            await conn.execute(
+                "UPDATE jobs SET status = $1, result = $2, error = $3, finished_at = $4, lease_until = NULL WHERE id = $5",
+                status, result, error, finished_at, job_id
+            )
+
+    async def requeue_jobs(self, job_ids: List[str]):
+        async with self._conn() as conn:
+            await conn.execute(
+                "UPDATE jobs SET status = $1, started_at = NULL, lease_until = NULL WHERE id = ANY($2::text[]) AND status = $3",
+                QUEUED, job_ids, RUNNING
+            )
+
+    async def set_callback_status(self, job_id: str, outcome: str):
+        async with self._conn() as conn:
+            await conn.execute("UPDATE jobs SET callback_status = $1 WHERE id = $2", outcome, job_id)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for GET / (in-memory UI with compressed variants and ETags)
+Run: python test_assets.py (or pytest)
+"""
+import gzip
+import zlib
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import assets
+import main
+
+client = TestClient(main.app)
+
+
+def _get(accept_encoding: str = "identity", **headers):
+    return client.get("/", headers={"Accept-Encoding": accept_encoding, **headers})
+
+
+def _with_fake_brotli(test):
+    """Run test with a stand-in br encoder (zlib), whether or not brotli is installed"""
+    original = assets.brotli
+    assets.brotli = SimpleNamespace(compress=lambda body, quality: zlib.compress(body, 9))
+    main._ui.load()
+    try:
+        test()
+    finally:
+        assets.brotli = original
+        main._ui.load()
+
+
+def test_identity_when_nothing_else_is_accepted():
+    response = _get("identity")
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith("text/html")
+    assert b"<html" in response.content.lower()
+
+
+def test_gzip_when_accepted():
+    plain = _get("identity")
+    response = _get("gzip, deflate")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx decodes the body; the wire bytes are main._ui's gzip variant
+    assert response.content == plain.content
+    assert gzip.decompress(main._ui._variants["gzip"][0]) == plain.content
+    # Each encoding has its own tag
+    assert response.headers["etag"] != plain.headers["etag"]
+
+    # q=0 rules gzip out
+    assert "content-encoding" not in _get("gzip;q=0, identity").headers
+
+
+def test_br_preferred_over_gzip_and_q_values_respected():
+    def test():
+        assert main._ui._variants["br"]
+        assert _get("gzip, br").headers["content-encoding"] == "br"
+        assert _get("gzip;q=1.0, br;q=0.5").headers["content-encoding"] == "gzip"
+        assert _get("*").headers["content-encoding"] == "br"
+        assert _get("gzip").headers["content-encoding"] == "gzip"
+
+    _with_fake_brotli(test)
+
+
+def test_if_none_match_returns_304_for_the_same_encoding():
+    etag = _get("gzip").headers["etag"]
+
+    response = _get("gzip", **{"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    # Weak comparison, lists and *
+    assert _get("gzip", **{"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert _get("gzip", **{"If-None-Match": "*"}).status_code == 304
+
+    # The gzip tag does not validate the identity variant
+    assert _get("identity", **{"If-None-Match": etag}).status_code == 200
+
+
+def test_etags_are_stable_across_reloads():
+    before = {coding: tag for coding, (_, tag) in main._ui._variants.items()}
+    main._ui.load()
+    assert {coding: tag for coding, (_, tag) in main._ui._variants.items()} == before
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
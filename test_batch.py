@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for /analyze/batch claim grouping
+Run: python test_batch.py (or pytest)
+"""
+from main import _group_batch_claims
+
+
+def test_duplicates_share_a_leader():
+    claims = ["Bleach cures COVID", "bleach cures covid", "Bleach cures COVID!!", "Aliens built the pyramids"]
+    assert _group_batch_claims(claims) == [0, 0, 0, 3]
+
+
+def test_negated_claim_gets_its_own_analysis():
+    claims = ["vaccines cause autism", "vaccines do not cause autism", "Vaccines cause autism!"]
+    assert _group_batch_claims(claims) == [0, 1, 0]
+
+
+def test_different_numbers_are_not_grouped():
+    claims = ["The earth is 6000 years old", "The earth is 4000 years old"]
+    assert _group_batch_claims(claims) == [0, 1]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
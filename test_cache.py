@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process TTL/LRU cache
+Run: python test_cache.py (or pytest)
+"""
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_their_own_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2, ttl=60)
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert len(cache) == 1
+    clock.now += 55
+    assert cache.get("long", "gone") == "gone"
+
+
+def test_non_positive_ttl_or_size_stores_nothing():
+    cache = TTLCache(10)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+    disabled = TTLCache(0)
+    disabled.set("a", 1, ttl=60)
+    assert len(disabled) == 0
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = TTLCache(3)
+    for key in "abc":
+        cache.set(key, key, ttl=60)
+    cache.get("a")           # a is now the most recently used
+    cache.set("d", "d", ttl=60)
+    assert cache.get("b") is None
+    assert [k for k, _ in cache.items()] == ["c", "a", "d"]
+    cache.set("c", "c2", ttl=60)  # overwriting refreshes recency too
+    cache.set("e", "e", ttl=60)
+    assert [k for k, _ in cache.items()] == ["d", "c", "e"]
+
+
+def test_items_skips_expired_entries():
+    clock = FakeClock()
+    cache = TTLCache(10, clock=clock)
+    cache.set("a", 1, ttl=1)
+    cache.set("b", 2, ttl=10)
+    clock.now += 2
+    assert list(cache.items()) == [("b", 2)]
+
+
+def test_on_evict_sees_every_value_that_leaves():
+    clock = FakeClock()
+    gone = []
+    cache = TTLCache(2, clock=clock, on_evict=lambda key, value: gone.append((key, value)))
+    cache.set("a", 1, ttl=60)
+    cache.set("a", 2, ttl=60)      # replaced
+    cache.set("b", 3, ttl=1)
+    cache.set("c", 4, ttl=60)      # evicts a (LRU)
+    clock.now += 2
+    cache.get("b")                 # expired
+    cache.pop("c")
+    cache.set("d", 5, ttl=60)
+    cache.clear()
+    assert gone == [("a", 1), ("a", 2), ("b", 3), ("c", 4), ("d", 5)]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the MinHash/LSH candidate index
+Run: python test_claim_index.py (or pytest)
+"""
+import asyncio
+import os
+import tempfile
+
+import claim_index
+from memory import Memory
+from storage import SQLiteStorage
+
+NEAR_DUPLICATES = [
+    ("drinking bleach cures covid", "drinking bleach cures covid-19"),
+    ("5g towers spread the coronavirus", "5g towers spread coronavirus"),
+    ("the moon landing was staged in a studio", "the moon landing was staged in a film studio"),
+]
+UNRELATED = [
+    ("drinking bleach cures covid", "the eiffel tower is in berlin"),
+    ("5g towers spread the coronavirus", "bitcoin will replace the us dollar by 2030"),
+]
+
+
+def _shared(a: str, b: str) -> int:
+    return len(set(claim_index.bucket_keys(a)) & set(claim_index.bucket_keys(b)))
+
+
+def _record(claim: str, normalized: str = "") -> dict:
+    normalized = normalized or claim.lower()
+    return {
+        "claim_hash": f"hash:{claim.lower()}", "claim_text": claim, "normalized_claim": normalized,
+        "result": {"verdict": "false"}, "embedding": None,
+        "buckets": claim_index.bucket_keys(normalized),
+    }
+
+
+def test_bucket_keys_are_deterministic_signed_64_bit():
+    keys = claim_index.bucket_keys("drinking bleach cures covid")
+    assert len(keys) == claim_index.BANDS
+    assert keys == claim_index.bucket_keys("drinking bleach cures covid")
+    assert all(-(1 << 63) <= key < (1 << 63) for key in keys)
+    # Short claims still get a full set of keys
+    assert len(claim_index.bucket_keys("a")) == claim_index.BANDS
+
+
+def test_near_duplicates_share_buckets_and_unrelated_claims_do_not():
+    for a, b in NEAR_DUPLICATES:
+        assert _shared(a, b) >= 1, (a, b)
+    for a, b in UNRELATED:
+        assert _shared(a, b) == 0, (a, b)
+
+
+def test_storage_candidates_follow_upserts():
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteStorage(os.path.join(tmp, "claims.db"), read_pool_size=1)
+            await store.connect()
+            await store.migrate()
+            try:
+                (bleach, eiffel) = await store.upsert_claims([
+                    _record("Drinking bleach cures covid"), _record("The Eiffel tower is in Berlin")
+                ])
+                query = claim_index.bucket_keys("drinking bleach cures covid-19")
+                assert [row["id"] for row in await store.lsh_candidates(query, 10)] == [bleach]
+
+                # Re-storing the same claim keeps one set of buckets
+                await store.upsert_claims([_record("Drinking bleach cures covid")] * 2)
+                async with store.reader() as db:
+                    cursor = await db.execute("SELECT COUNT(*) FROM claim_lsh WHERE claim_id = ?", (bleach,))
+                    (count,) = await cursor.fetchone()
+                assert count == len(set(claim_index.bucket_keys("drinking bleach cures covid")))
+
+                # An overwrite with new text replaces the old buckets
+                await store.upsert_claims([_record("Drinking bleach cures covid", "the eiffel tower is in paris")])
+                assert await store.lsh_candidates(query, 10) == []
+                paris = claim_index.bucket_keys("the eiffel tower is in paris!")
+                assert {row["id"] for row in await store.lsh_candidates(paris, 10)} == {bleach, eiffel}
+            finally:
+                await store.close()
+
+    asyncio.run(run())
+
+
+def test_memory_fuzzy_lookup_uses_the_index():
+    async def run():
+        memory = Memory(":memory:")
+        await memory.init_db()
+        try:
+            await memory.store_claim("Drinking bleach cures COVID", {"verdict": "false", "confidence": 95})
+            await memory.store_claim("The Eiffel tower is in Berlin", {"verdict": "false", "confidence": 99})
+
+            match = await memory.find_similar_claim("Drinking bleach really cures COVID")
+            assert match["match_type"] == "fuzzy"
+            assert match["claim_text"] == "Drinking bleach cures COVID"
+            assert await memory.find_similar_claim("Bitcoin will replace the US dollar") is None
+
+            # Overwrites are seen by later fuzzy lookups
+            await memory.store_claim("Drinking bleach cures COVID", {"verdict": "uncertain", "confidence": 40})
+            match = await memory.find_similar_claim("Drinking bleach really cures COVID")
+            assert match["json_blob"]["verdict"] == "uncertain"
+        finally:
+            await memory.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
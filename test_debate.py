@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the Chain-of-Debate agents (no LLM calls: agents and the client are replaced)
+Run: python test_debate.py (or pytest)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import jsonutil
+from cod_agents import CHARS_PER_TOKEN, CoD_Agents, pack_evidence
+from llm_cache import make_llm_cache
+from outbound import OutboundPolicy
+
+EVIDENCE = {"for": [], "against": [], "all": []}
+
+
+def _fake_client(agents: CoD_Agents, contents: list) -> list:
+    """Replace the LLM client; each call answers with the next content. Returns the call log."""
+    calls = []
+
+    async def create(**request):
+        calls.append(agents.limiter.active)
+        message = SimpleNamespace(content=contents[len(calls) - 1])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    agents.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return calls
+
+
+def _agents(moderator) -> CoD_Agents:
+    agents = CoD_Agents()
+    agents.agent_timeout = 0.1
+
+    async def verifier(claim, results):
+        return {"stance": "support", "evidence_for": []}
+
+    async def skeptic(claim, results):
+        return {"stance": "refute", "evidence_against": []}
+
+    agents.verifier_agent = verifier
+    agents.skeptic_agent = skeptic
+    agents.moderator_agent = moderator
+    return agents
+
+
+def test_moderator_timeout_returns_uncertain_verdict():
+    async def moderator(claim, verifier_output, skeptic_output, on_token=None, on_field=None):
+        await asyncio.sleep(5)
+        return {"verdict": "true", "confidence": 99}
+
+    async def run():
+        agents = _agents(moderator)
+        out = await asyncio.wait_for(agents.run_debate("claim", EVIDENCE, tiered=False), timeout=2)
+        assert out["verdict"] == "uncertain"
+        assert out["confidence"] == 20
+        assert "Moderator timed out" in out["uncertainties"][0]
+        assert out["debate_tier"] == "full"
+        assert out["verifier_stance"] == "support"
+        await agents.aclose()
+
+    asyncio.run(run())
+
+
+def test_moderator_error_returns_uncertain_verdict():
+    async def moderator(claim, verifier_output, skeptic_output, on_token=None, on_field=None):
+        return {"error": "upstream 500"}
+
+    async def run():
+        agents = _agents(moderator)
+        out = await agents.run_debate("claim", EVIDENCE, tiered=False)
+        assert out["verdict"] == "uncertain"
+        assert out["uncertainties"] == ["upstream 500"]
+        await agents.aclose()
+
+    asyncio.run(run())
+
+
+def test_retry_backoff_does_not_hold_an_llm_slot():
+    async def run():
+        agents = CoD_Agents()
+        agents.cache = None
+        agents.outbound = OutboundPolicy("llm", max_retries=1)
+        calls = []
+
+        async def create(**request):
+            calls.append(agents.limiter.active)
+            if len(calls) == 1:
+                request = httpx.Request("POST", "https://llm.example/v1")
+                response = httpx.Response(503, headers={"Retry-After": "0.2"}, request=request)
+                raise httpx.HTTPStatusError("503", request=request, response=response)
+            message = SimpleNamespace(content='{"verdict": "true"}')
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        agents.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        call = asyncio.create_task(agents._complete("verifier", "system", "user", None, None))
+        await asyncio.sleep(0.1)
+        # Backing off: the slot is free for other work
+        assert len(calls) == 1 and agents.limiter.active == 0
+        assert await call == {"verdict": "true"}
+        assert calls == [1, 1] and agents.limiter.active == 0
+        await agents.aclose()
+
+    asyncio.run(run())
+
+
+def test_incomplete_outputs_are_not_cached():
+    async def run():
+        agents = CoD_Agents()
+        agents.cache = make_llm_cache("memory", max_entries=10, ttl=60, path="")
+        calls = _fake_client(agents, [
+            '{"why_bullets": []}',
+            '{"verdict": "probably", "confidence": 70}',
+            '{"verdict": "false", "confidence": 90}',
+        ])
+        for expected in ({"why_bullets": []}, {"verdict": "probably", "confidence": 70}):
+            assert await agents._complete("moderator", "system", "user", None, None) == expected
+        good = await agents._complete("moderator", "system", "user", None, None)
+        # Only the complete answer is replayed
+        assert await agents._complete("moderator", "system", "user", None, None) == good
+        assert len(calls) == 3
+
+        calls = _fake_client(agents, ['{"verdict": "true", "confidence": 95}'] * 2)
+        for _ in range(2):
+            await agents._complete("triage", "system", "user", None, None)
+        assert len(calls) == 2  # no "decisive": asked again
+        await agents.aclose()
+
+    asyncio.run(run())
+
+
+def _results(count: int, snippet: str) -> list:
+    return [
+        {"title": f"Source {i}", "url": f"https://example.org/{i}", "snippet": snippet}
+        for i in range(count)
+    ]
+
+
+def test_packed_evidence_stays_within_the_token_budget():
+    for snippet in ("word " * 400, '"quoted" \\ path\n ' * 200, "naïve café — " * 300):
+        for budget in (300, 600, 1200):
+            packed = pack_evidence(_results(8, snippet), budget)
+            assert len(packed) <= budget * CHARS_PER_TOKEN, (snippet[:10], budget, len(packed))
+            assert len(jsonutil.loads(packed)) == 8
+
+
+def test_packed_evidence_truncates_snippets_only():
+    short = pack_evidence(_results(2, "Short snippet."), 600)
+    assert jsonutil.loads(short) == _results(2, "Short snippet.")
+
+    items = jsonutil.loads(pack_evidence(_results(4, "  lots   of\nwords " * 300), 300))
+    for i, item in enumerate(items):
+        assert item["title"] == f"Source {i}" and item["url"] == f"https://example.org/{i}"
+        assert item["snippet"].startswith("lots of words lots")
+        assert item["snippet"].endswith("…")
+    # Every snippet gets the same share
+    assert len({len(item["snippet"]) for item in items}) == 1
+
+
+def test_packed_evidence_drops_duplicates_and_empty_items():
+    results = _results(2, "a") + [
+        {"title": "Again", "url": "https://example.org/0", "snippet": "b"},
+        {"title": "", "url": "", "snippet": "nothing to cite"},
+    ]
+    assert [item["url"] for item in jsonutil.loads(pack_evidence(results, 600))] == [
+        "https://example.org/0", "https://example.org/1"
+    ]
+
+
+def test_packed_evidence_is_deterministic():
+    results = _results(6, "The same evidence, word for word. " * 50)
+    packed = pack_evidence(results, 500)
+    assert all(pack_evidence([dict(r) for r in results], 500) == packed for _ in range(3))
+    # The input is left as it was
+    assert results == _results(6, "The same evidence, word for word. " * 50)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
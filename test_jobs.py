@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job queue
+Run: python test_jobs.py (or pytest)
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import tempfile
+
+import httpx
+
+from jobs import DONE, JobQueue, check_callback_url
+from memory import Memory
+
+
+async def _queue(runner, **kwargs) -> JobQueue:
+    memory = Memory(":memory:")
+    await memory.init_db()
+    queue = JobQueue(memory, runner, poll_interval=0.05, **kwargs)
+    await queue.init_db()
+    return queue
+
+
+async def _wait_done(queue: JobQueue, job_id: str, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.02)):
+        job = await queue.get(job_id)
+        if job["status"] == DONE:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_worker_survives_storage_error():
+    async def run():
+        async def runner(claim, context):
+            return {"verdict": "false", "claim": claim}
+
+        queue = await _queue(runner, workers=1)
+        claim_job = queue.store.claim_job
+        calls = {"n": 0}
+
+        async def flaky_claim_job(now, lease):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return await claim_job(now, lease)
+
+        queue.store.claim_job = flaky_claim_job
+        job = await queue.submit("flaky storage", {})
+        await queue.start()
+        try:
+            done = await _wait_done(queue, job["id"])
+            assert done["result"]["claim"] == "flaky storage"
+            assert all(not task.done() for task in queue._tasks)
+        finally:
+            await queue.stop()
+            await queue.memory.close()
+
+    asyncio.run(run())
+
+
+def test_callback_delivery_does_not_block_worker():
+    async def run():
+        async def runner(claim, context):
+            return {"claim": claim}
+
+        queue = await _queue(runner, workers=1)
+        release = asyncio.Event()
+        delivered = []
+
+        async def slow_deliver(job_id, url, payload):
+            await release.wait()
+            delivered.append(job_id)
+
+        queue._deliver = slow_deliver
+        first = await queue.submit("first", {}, callback_url="https://93.184.215.14/hook")
+        second = await queue.submit("second", {})
+        await queue.start()
+        try:
+            # One worker: the second job only runs if the first callback is off the worker
+            await _wait_done(queue, second["id"])
+            assert delivered == []
+            release.set()
+            await asyncio.sleep(0.05)
+            assert delivered == [first["id"]]
+        finally:
+            await queue.stop()
+            await queue.memory.close()
+
+    asyncio.run(run())
+
+
+def test_callback_url_rejects_internal_hosts():
+    async def run():
+        for url in (
+            "ftp://example.com/hook",
+            "http:///hook",
+            "http://127.0.0.1:8000/hook",
+            "http://localhost/hook",
+            "http://[::1]/hook",
+            "http://169.254.169.254/latest/meta-data",
+            "http://0.0.0.0/hook",
+            "http://[::ffff:127.0.0.1]:8000/x",
+            "http://[::ffff:169.254.169.254]/latest",
+            "http://10.1.2.3/hook",
+            "http://172.16.0.1/hook",
+            "http://192.168.1.1/hook",
+            "http://[fc00::1]/hook",
+            "http://224.0.0.1/hook",
+            "http://240.0.0.1/hook",
+        ):
+            try:
+                await check_callback_url(url)
+            except ValueError:
+                continue
+            raise AssertionError(f"{url} was accepted")
+        await check_callback_url("https://93.184.215.14/hook")
+
+        queue = await _queue(lambda claim, context: None)
+        try:
+            await queue.submit("claim", {}, callback_url="http://127.0.0.1/hook")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("submit accepted a loopback callback")
+        finally:
+            await queue.memory.close()
+
+    asyncio.run(run())
+
+
+def test_callback_is_delivered_to_the_checked_address():
+    async def run():
+        queue = await _queue(lambda claim, context: None, callback_attempts=1)
+        lookups, sent = [], []
+        loop = asyncio.get_running_loop()
+
+        async def getaddrinfo(host, port, **kwargs):
+            # A rebinding resolver: public on the first lookup, loopback after
+            lookups.append(host)
+            address = "93.184.215.14" if len(lookups) == 1 else "127.0.0.1"
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+        async def send(client, request, **kwargs):
+            sent.append(request)
+            return httpx.Response(204, request=request)
+
+        loop.getaddrinfo = getaddrinfo
+        original_send = httpx.AsyncClient.send
+        httpx.AsyncClient.send = send
+        try:
+            await queue._deliver("job-1", "https://hooks.example.com:8443/done?x=1", {"ok": True})
+        finally:
+            httpx.AsyncClient.send = original_send
+            del loop.getaddrinfo
+            await queue.memory.close()
+
+        assert lookups == ["hooks.example.com"]
+        (request,) = sent
+        assert str(request.url) == "https://93.184.215.14:8443/done?x=1"
+        assert request.headers["Host"] == "hooks.example.com:8443"
+        assert request.extensions["sni_hostname"] == "hooks.example.com"
+
+    asyncio.run(run())
+
+
+def test_lease_renewal_error_keeps_heartbeat():
+    async def run():
+        queue = await _queue(lambda claim, context: None, lease=0.09)
+        calls = {"n": 0}
+
+        async def failing_renew(job_id, lease_until):
+            calls["n"] += 1
+            raise sqlite3.OperationalError("database is locked")
+
+        queue.store.renew_job = failing_renew
+        heartbeat = asyncio.create_task(queue._renew_lease("job"))
+        await asyncio.sleep(0.2)
+        assert calls["n"] >= 2 and not heartbeat.done()
+        heartbeat.cancel()
+        await queue.memory.close()
+
+    asyncio.run(run())
+
+
+def test_expired_lease_is_taken_over_by_another_process():
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+        ran = []
+
+        async def runner(claim, context):
+            ran.append(claim)
+            await asyncio.sleep(0.4)
+            return {"claim": claim}
+
+        # Two queues on one database file stand in for two worker processes
+        dead, live = Memory(path), Memory(path)
+        await dead.init_db()
+        await live.init_db()
+        first = JobQueue(dead, runner, workers=1, poll_interval=0.05, lease=0.3)
+        second = JobQueue(live, runner, workers=1, poll_interval=0.05, lease=0.3)
+        await first.init_db()
+        try:
+            job = await first.submit("orphaned", {})
+            # The first process claims the job and dies without renewing its lease
+            assert (await first._claim_next())["id"] == job["id"]
+            assert await second._claim_next() is None
+
+            await asyncio.sleep(0.35)
+            await second.start()
+            done = await _wait_done(second, job["id"])
+            assert done["attempts"] == 2 and ran == ["orphaned"]
+
+            # A live worker renews its lease, so a long job is never stolen
+            slow = await second.submit("long running", {})
+            await asyncio.sleep(0.9)
+            assert await first._claim_next() is None
+            assert (await _wait_done(second, slow["id"]))["attempts"] == 1
+        finally:
+            await second.stop()
+            await dead.close()
+            await live.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
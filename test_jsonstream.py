@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for FieldScanner (streamed JSON fields)
+Run: python test_jsonstream.py (or pytest)
+"""
+from jsonstream import FieldScanner
+
+
+def _feed(chunks):
+    scanner = FieldScanner()
+    return [scanner.feed(chunk) for chunk in chunks]
+
+
+def test_fields_split_across_chunks():
+    text = '{"verdict": "false", "confidence": 85, "risk_level": "high"}'
+    fields = [field for chunk in _feed([text[i:i + 3] for i in range(0, len(text), 3)]) for field in chunk]
+    assert fields == [("verdict", "false"), ("confidence", 85), ("risk_level", "high")]
+
+
+def test_field_is_returned_in_the_chunk_that_closes_it():
+    per_chunk = _feed(['{"verdict": "fa', 'lse", "confi', 'dence": 9', '0}'])
+    assert per_chunk == [[], [("verdict", "false")], [], [("confidence", 90)]]
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    per_chunk = _feed(['{"why": "he said \\"no\\" {not', ' a brace}\\\\", "n": 1}'])
+    assert per_chunk[1] == [("why", 'he said "no" {not a brace}\\'), ("n", 1)]
+
+
+def test_nested_values_arrive_whole():
+    text = '{"verdict": "mixed", "reply_templates": {"neutral": "a", "inner": [1, {"x": "}"}]}, "topic": "health"}'
+    per_chunk = _feed([text[:60], text[60:]])
+    fields = [field for chunk in per_chunk for field in chunk]
+    assert fields == [
+        ("verdict", "mixed"),
+        ("reply_templates", {"neutral": "a", "inner": [1, {"x": "}"}]}),
+        ("topic", "health"),
+    ]
+    # The nested object only closes in the second chunk
+    assert [key for key, _ in per_chunk[0]] == ["verdict"]
+
+
+def test_text_around_the_object_is_ignored():
+    fields = _feed(['```json\n{"ok": true, "none": null}', '\n```\n{"late": 1}'])
+    assert fields == [[("ok", True), ("none", None)], []]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
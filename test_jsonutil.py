@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for jsonutil: the orjson and stdlib encoders must write the same JSON
+Run: python test_jsonutil.py (or pytest)
+"""
+import datetime
+import json
+import uuid
+from contextlib import contextmanager
+
+import jsonutil
+
+UTC = datetime.timezone.utc
+CASES = [
+    {"verdict": "false", "confidence": 87, "score": 0.5, "ok": True, "none": None, "list": [1, "two", 3.25]},
+    {"snippet": "naïve café — “quoted” \\ path\n", "emoji": "🛡️", "nested": {"a": [{"b": []}]}},
+    {1: "int key", 2.5: "float key", False: "bool key", None: "null key"},
+    {"at": datetime.datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=UTC)},
+    {"naive": datetime.datetime(2024, 3, 1, 12, 30), "day": datetime.date(2024, 3, 1), "time": datetime.time(8, 15)},
+    {"offset": datetime.datetime(2024, 3, 1, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30)))},
+    {datetime.date(2024, 3, 1): "date key", uuid.UUID(int=7): "uuid key", "id": uuid.UUID(int=42)},
+    {"nan": float("nan"), "inf": [float("inf"), float("-inf")], "tuple": (1, 2)},
+    [],
+    "plain string",
+]
+
+
+@contextmanager
+def _stdlib():
+    """Encode and decode as if orjson were not installed"""
+    original = jsonutil.orjson
+    jsonutil.orjson = None
+    try:
+        yield
+    finally:
+        jsonutil.orjson = original
+
+
+def _reject(constant: str):
+    raise ValueError(f"{constant} is not JSON")
+
+
+def _both(obj):
+    """(orjson output, stdlib output) for obj, via dumps and dumpb"""
+    fast = jsonutil.dumps(obj), jsonutil.dumpb(obj)
+    with _stdlib():
+        slow = jsonutil.dumps(obj), jsonutil.dumpb(obj)
+    assert fast[1] == fast[0].encode() and slow[1] == slow[0].encode()
+    return fast[0], slow[0]
+
+
+def test_both_encoders_write_the_same_json():
+    if jsonutil.orjson is None:
+        print("orjson is not installed: comparing the stdlib path with itself")
+    for obj in CASES:
+        fast, slow = _both(obj)
+        assert fast == slow, (obj, fast, slow)
+        # Strict JSON either way: no NaN or Infinity literals
+        json.loads(fast, parse_constant=_reject)
+
+
+def test_stdlib_fallback_values():
+    with _stdlib():
+        assert jsonutil.dumps({1: "a", None: "b", False: "c"}) == '{"1":"a","null":"b","false":"c"}'
+        assert jsonutil.dumps({"at": datetime.datetime(2024, 3, 1, tzinfo=UTC)}) == '{"at":"2024-03-01T00:00:00+00:00"}'
+        assert jsonutil.dumps([float("nan")]) == "[null]"
+        assert jsonutil.dumps("é") == '"é"'
+        assert jsonutil.loads(b'{"a":[1,2]}') == {"a": [1, 2]}
+        try:
+            jsonutil.dumps({"x": object()})
+            raise AssertionError("expected TypeError")
+        except TypeError:
+            pass
+
+
+def test_big_ints_fall_back_to_the_stdlib():
+    obj = {"big": 2 ** 70, "at": datetime.date(2024, 3, 1), 3: -(2 ** 65)}
+    fast, slow = _both(obj)
+    assert fast == slow == '{"big":1180591620717411303424,"at":"2024-03-01","3":-36893488147419103232}'
+    assert jsonutil.loads(fast)["big"] == 2 ** 70
+
+
+def test_floats_round_trip_on_both_paths():
+    # Float text may differ (1e+20 vs 1e20); the values may not
+    values = [0.1, 1e20, -2.5e-8, 123456789.125, 1.0]
+    fast, slow = _both(values)
+    assert jsonutil.loads(fast) == values
+    with _stdlib():
+        assert jsonutil.loads(slow) == values
+
+
+def test_fast_json_response_renders_with_either_encoder():
+    content = {"verdict": "true", "checked_at": datetime.datetime(2024, 3, 1, tzinfo=UTC), 7: "seven"}
+    fast = jsonutil.FastJSONResponse(content)
+    with _stdlib():
+        slow = jsonutil.FastJSONResponse(content)
+    assert fast.body == slow.body
+    assert fast.headers["content-type"] == "application/json"
+    assert int(fast.headers["content-length"]) == len(fast.body)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for Memory's verdict caching
+Run: python test_memory.py (or pytest)
+"""
+import asyncio
+import os
+import tempfile
+
+from memory import Memory
+
+
+def _verdict(verdict: str) -> dict:
+    return {"verdict": verdict, "confidence": 90, "evidence_for": [], "evidence_against": []}
+
+
+def test_overwrite_drops_hot_entries_for_every_lookup_key():
+    async def run():
+        memory = Memory(":memory:")
+        await memory.init_db()
+        try:
+            await memory.store_claim("Drinking bleach cures COVID", _verdict("false"))
+            # A fuzzy lookup caches the row under its own key
+            fuzzy = await memory.get_cached_verdict("Drinking bleach cures COVID!!")
+            assert fuzzy["match_type"] == "fuzzy"
+            assert memory._hot_keys[memory.hash_claim("Drinking bleach cures COVID")] == {
+                memory.hash_claim("Drinking bleach cures COVID"),
+                memory.hash_claim("Drinking bleach cures COVID!!"),
+            }
+
+            await memory.store_claim("Drinking bleach cures COVID", _verdict("uncertain"))
+            again = await memory.get_cached_verdict("Drinking bleach cures COVID!!")
+            assert again["json_blob"]["verdict"] == "uncertain"
+        finally:
+            await memory.close()
+
+    asyncio.run(run())
+
+
+def test_hot_index_shrinks_with_the_cache():
+    async def run():
+        memory = Memory(":memory:", hot_cache_size=2)
+        await memory.init_db()
+        try:
+            for i in range(5):
+                await memory.store_claim(f"Claim number {'x' * i} about things", _verdict("false"))
+            assert len(memory._hot) == 2
+            assert sum(len(keys) for keys in memory._hot_keys.values()) == 2
+        finally:
+            await memory.close()
+
+    asyncio.run(run())
+
+
+def test_other_process_overwrite_reaches_hot_tier():
+    async def run():
+        path = os.path.join(tempfile.mkdtemp(), "shared.db")
+        a, b = Memory(path), Memory(path)
+        await a.init_db()
+        await b.init_db()
+        a.sync_interval = b.sync_interval = 0
+        try:
+            await a.store_claim("The moon landing was faked", _verdict("false"))
+            await a.get_cached_verdict("The moon landing was faked")
+            first = await a.get_cached_verdict("The moon landing was faked")
+            assert first["json_blob"]["verdict"] == "false" and a.hot_hits >= 1
+
+            # Another worker process stores a new verdict for the same claim
+            await b.store_claim("The moon landing was faked", _verdict("uncertain"))
+            again = await a.get_cached_verdict("The moon landing was faked")
+            assert again["json_blob"]["verdict"] == "uncertain"
+        finally:
+            await a.close()
+            await b.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
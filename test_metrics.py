@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics exposition and per-request stage breakdown
+Run: python test_metrics.py (or pytest)
+"""
+import asyncio
+
+import metrics
+
+
+def test_counter_and_gauge_exposition():
+    counter = metrics.Counter("test_requests_total", "Requests by route", ["route"])
+    counter.inc(route="/b")
+    counter.inc(2, route="/a")
+    counter.inc(route="/a")
+    gauge = metrics.Gauge("test_inflight", "In flight")
+    gauge.set(3)
+    gauge.set(1)
+
+    assert counter.render() == [
+        "# HELP test_requests_total Requests by route",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{route="/a"} 3.0',
+        'test_requests_total{route="/b"} 1.0',
+    ]
+    assert gauge.render()[1:] == ["# TYPE test_inflight gauge", "test_inflight 1.0"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage="db")
+
+    assert histogram.render()[2:] == [
+        'test_latency_seconds_bucket{stage="db",le="0.1"} 1',
+        'test_latency_seconds_bucket{stage="db",le="1.0"} 3',
+        'test_latency_seconds_bucket{stage="db",le="+Inf"} 4',
+        'test_latency_seconds_sum{stage="db"} 4.05',
+        'test_latency_seconds_count{stage="db"} 4',
+    ]
+
+
+def test_render_includes_every_registered_metric():
+    metrics.Counter("test_render_total", "Rendered").inc()
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert "# TYPE debateshield_stage_seconds histogram" in text
+    assert "test_render_total 1.0" in text.splitlines()
+
+
+def test_request_breakdown_collects_stages_and_tokens():
+    async def run():
+        breakdown = metrics.start_request()
+
+        async def agent():
+            # Spawned tasks copy the context, so they report into the same breakdown
+            with metrics.stage("test.agent"):
+                metrics.record_tokens("test_agent", 120, 30)
+
+        await asyncio.gather(agent(), metrics.timed("test.sleep", asyncio.sleep(0)))
+        return breakdown
+
+    breakdown = asyncio.run(run())
+    assert set(breakdown["stages"]) == {"test.agent", "test.sleep"}
+    assert breakdown["tokens"]["test_agent"] == {"prompt": 120, "completion": 30}
+    assert 'debateshield_llm_tokens_total{agent="test_agent",kind="prompt"} 120.0' in metrics.render()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
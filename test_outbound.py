@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests for the outbound call policy (token bucket, circuit breaker, retries)
+Run: python test_outbound.py (or pytest)
+"""
+import asyncio
+import email.utils
+import time
+
+import httpx
+
+from outbound import CircuitBreaker, CircuitOpenError, OutboundPolicy, TokenBucket, retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://upstream.example/v1")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def _failing(*errors):
+    """fn for OutboundPolicy.call raising the given errors in turn, then returning "ok" """
+    remaining = list(errors)
+
+    async def fn():
+        if remaining:
+            raise remaining.pop(0)
+        return "ok"
+    return fn
+
+
+def test_token_bucket_spends_burst_then_paces():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        assert time.monotonic() - start < 0.01
+        for _ in range(2):
+            await bucket.acquire()
+        # Two more tokens at 50/s
+        assert time.monotonic() - start >= 0.035
+
+    asyncio.run(run())
+
+
+def test_token_bucket_pause_holds_callers():
+    async def run():
+        bucket = TokenBucket(rate=0, burst=1)
+        bucket.pause(0.05)
+        start = time.monotonic()
+        await bucket.acquire()
+        assert time.monotonic() - start >= 0.045
+
+    asyncio.run(run())
+
+
+def test_breaker_opens_then_admits_one_trial():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == "closed"
+    breaker.record_failure(breaker.allow())
+    assert breaker.state == "open" and breaker.allow() is None
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    trial = breaker.allow()
+    assert trial is not None and breaker.allow() is None
+    breaker.record_failure(trial)
+    assert breaker.state == "open"
+
+    clock.now += 10
+    breaker.record_success(breaker.allow())
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.rejected == 2
+
+
+def test_stale_call_cannot_end_the_trial():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    # Admitted while closed, still running when the breaker opens and goes half-open
+    stale = breaker.allow()
+    breaker.record_failure(breaker.allow())
+    clock.now += 10
+    trial = breaker.allow()
+
+    breaker.abandon(stale)
+    assert breaker.allow() is None
+    breaker.abandon(trial)
+    assert breaker.allow() is not None
+
+
+def test_client_errors_do_not_reset_failures():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        policy = OutboundPolicy("test", max_retries=0, breaker=breaker)
+        for status in (500, 400, 502, 404, 503):
+            try:
+                await policy.call(_failing(_status_error(status)))
+            except httpx.HTTPStatusError:
+                pass
+        assert breaker.state == "open"
+        try:
+            await policy.call(_failing())
+            raise AssertionError("expected CircuitOpenError")
+        except CircuitOpenError:
+            pass
+
+    asyncio.run(run())
+
+
+def test_retry_after_is_honoured_and_pauses_the_bucket():
+    async def run():
+        policy = OutboundPolicy("test", max_retries=2, backoff_max=5)
+        start = time.monotonic()
+        result = await policy.call(_failing(_status_error(429, {"Retry-After": "0.05"})))
+        assert result == "ok"
+        assert time.monotonic() - start >= 0.045
+        assert policy.retries == 1 and policy.failures == 0
+        assert policy.bucket._paused_until > 0
+        assert policy.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_retries_stop_after_max_retries():
+    async def run():
+        policy = OutboundPolicy("test", max_retries=2, backoff_base=0.001, backoff_max=0.01)
+        try:
+            await policy.call(_failing(*[_status_error(503) for _ in range(5)]))
+            raise AssertionError("expected HTTPStatusError")
+        except httpx.HTTPStatusError as e:
+            assert e.response.status_code == 503
+        assert policy.retries == 2 and policy.failures == 1
+
+        # Not retryable: raised at once
+        policy = OutboundPolicy("test", max_retries=2)
+        try:
+            await policy.call(_failing(_status_error(401)))
+        except httpx.HTTPStatusError:
+            pass
+        assert policy.retries == 0
+
+    asyncio.run(run())
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = OutboundPolicy("test", backoff_base=0.5, backoff_max=3)
+    error = _status_error(503)
+    for attempt in range(6):
+        delay = policy._backoff(attempt, error)
+        assert 0 <= delay <= min(3, 0.5 * 2 ** attempt)
+    # A hint wins, capped at backoff_max
+    assert policy._backoff(0, _status_error(503, {"Retry-After": "2"})) == 2
+    assert policy._backoff(0, _status_error(503, {"Retry-After": "120"})) == 3
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after(_status_error(429, {"Retry-After": "7"})) == 7
+    later = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= retry_after(_status_error(429, {"Retry-After": later})) <= 30
+    assert retry_after(_status_error(429, {"Retry-After": "soon"})) is None
+    assert retry_after(_status_error(429)) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for request coalescing in the analysis pipeline
+Run: python test_pipeline.py (or pytest)
+"""
+import asyncio
+
+import main
+import scheduler
+
+
+def _fake_pipeline(runs):
+    async def execute(claim, context, emit=None, shed=False):
+        runs.append(shed)
+        await asyncio.sleep(0.05)
+        if shed:
+            # What admission does to a low-priority claim when the queue is full
+            raise scheduler.Overloaded(3)
+        return {"claim": claim, "context": context, "meta": {"latency_ms": 50}}
+    return execute
+
+
+def test_non_shedding_follower_survives_shed_leader():
+    async def run():
+        runs = []
+        original = main._execute_pipeline
+        main._execute_pipeline = _fake_pipeline(runs)
+        try:
+            leader = asyncio.create_task(main._run_pipeline("follower claim", {}, shed=True))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(main._run_pipeline("Follower claim", {"source": "batch"}))
+            leader_result, follower_result = await asyncio.gather(leader, follower, return_exceptions=True)
+        finally:
+            main._execute_pipeline = original
+        assert isinstance(leader_result, scheduler.Overloaded)
+        assert follower_result["claim"] == "Follower claim"
+        # The follower ran its own execution, which queues instead of shedding
+        assert runs == [True, False]
+
+    asyncio.run(run())
+
+
+def test_shedding_follower_shares_leader_overload():
+    async def run():
+        runs = []
+        original = main._execute_pipeline
+        main._execute_pipeline = _fake_pipeline(runs)
+        try:
+            leader = asyncio.create_task(main._run_pipeline("shed claim", {}, shed=True))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(main._run_pipeline("shed claim", {}, shed=True))
+            results = await asyncio.gather(leader, follower, return_exceptions=True)
+        finally:
+            main._execute_pipeline = original
+        assert all(isinstance(r, scheduler.Overloaded) for r in results)
+        assert runs == [True]
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for PriorityLimiter (priority order, cancellation, boost, shedding)
+Run: python test_scheduler.py (or pytest)
+"""
+import asyncio
+
+from scheduler import PRIORITIES, Overloaded, PriorityLimiter
+
+HIGH, MEDIUM, LOW = PRIORITIES["high"], PRIORITIES["medium"], PRIORITIES["low"]
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _waiter(limiter: PriorityLimiter, order: list, name: str, priority: int, **kwargs) -> asyncio.Task:
+    async def run():
+        async with limiter.slot(priority, **kwargs):
+            order.append(name)
+    return asyncio.create_task(run())
+
+
+def test_freed_slots_go_to_the_highest_priority_first():
+    async def run():
+        limiter, order = PriorityLimiter(1), []
+        await limiter.acquire(MEDIUM)
+        tasks = [
+            _waiter(limiter, order, "low", LOW),
+            _waiter(limiter, order, "high", HIGH),
+            _waiter(limiter, order, "medium-1", MEDIUM),
+            _waiter(limiter, order, "medium-2", MEDIUM),
+        ]
+        await _settle()
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ["high", "medium-1", "medium-2", "low"]
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_cancel_while_queued_frees_the_place():
+    async def run():
+        limiter, order = PriorityLimiter(1), []
+        await limiter.acquire(MEDIUM)
+        first = _waiter(limiter, order, "first", LOW)
+        second = _waiter(limiter, order, "second", LOW)
+        await _settle()
+        assert limiter.stats()["queued"]["low"] == 2
+
+        first.cancel()
+        await _settle()
+        assert limiter.stats()["queued"]["low"] == 1
+        limiter.release()
+        await second
+        assert order == ["second"] and first.cancelled()
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_cancel_after_handover_passes_the_slot_on():
+    async def run():
+        limiter, order = PriorityLimiter(1), []
+        await limiter.acquire(MEDIUM)
+        first = _waiter(limiter, order, "first", MEDIUM)
+        second = _waiter(limiter, order, "second", MEDIUM)
+        await _settle()
+
+        # The slot is handed to `first`, which is cancelled before it resumes
+        limiter.release()
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        assert order == ["second"]
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_boost_moves_a_queued_waiter_up():
+    async def run():
+        limiter, order = PriorityLimiter(1), []
+        await limiter.acquire(MEDIUM)
+        tasks = [
+            _waiter(limiter, order, "shared", LOW, key="claim"),
+            _waiter(limiter, order, "medium", MEDIUM),
+        ]
+        await _settle()
+        limiter.boost("claim", HIGH)
+        assert limiter.stats()["queued"] == {"high": 1, "medium": 1, "low": 0}
+        # Lowering is a no-op
+        limiter.boost("claim", LOW)
+        assert limiter.stats()["queued"]["high"] == 1
+
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ["shared", "medium"]
+
+    asyncio.run(run())
+
+
+def test_shed_when_the_queue_is_full():
+    async def run():
+        limiter, order = PriorityLimiter(1, max_waiting={LOW: 1}), []
+        await limiter.acquire(MEDIUM)
+        queued = _waiter(limiter, order, "queued", LOW, shed=True)
+        await _settle()
+
+        try:
+            await limiter.acquire(LOW, shed=True)
+            raise AssertionError("expected Overloaded")
+        except Overloaded as e:
+            assert e.retry_after >= 1
+        assert limiter.stats()["shed"]["low"] == 1
+
+        # Callers that do not opt in, and priorities without a cap, still queue
+        patient = _waiter(limiter, order, "patient", LOW)
+        urgent = _waiter(limiter, order, "urgent", HIGH, shed=True)
+        await _settle()
+        limiter.release()
+        await asyncio.gather(queued, patient, urgent)
+        assert order == ["urgent", "queued", "patient"]
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
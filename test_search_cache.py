@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the YouSearcher result cache (fresh, stale-while-revalidate, expiry)
+with a fake clock and a fake upstream
+Run: python test_search_cache.py (or pytest)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import you_search
+from cache import TTLCache
+from config import config
+
+TTL, STALE = 60.0, 300.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _run(test):
+    """Run test(searcher, clock, upstream) with the module clock faked and the upstream replaced"""
+    async def run():
+        clock = Clock()
+        original_time, original_stale = you_search.time, config.SEARCH_CACHE_STALE_S
+        you_search.time = SimpleNamespace(time=clock)
+        config.SEARCH_CACHE_STALE_S = STALE
+        searcher = you_search.YouSearcher()
+        searcher._cache = TTLCache(100, clock=clock)
+        searcher._store = None
+        upstream = SimpleNamespace(calls=0, fail=False, gate=None)
+
+        async def search(query, num_results):
+            upstream.calls += 1
+            if upstream.gate is not None:
+                await upstream.gate.wait()
+            if upstream.fail:
+                raise RuntimeError("upstream down")
+            return [{"title": f"result {upstream.calls}", "url": "https://example.org", "snippet": query}]
+
+        searcher._search = search
+        try:
+            await test(searcher, clock, upstream)
+        finally:
+            await searcher.aclose()
+            you_search.time, config.SEARCH_CACHE_STALE_S = original_time, original_stale
+
+    asyncio.run(run())
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_fresh_entries_are_served_from_cache():
+    async def test(searcher, clock, upstream):
+        first = await searcher.search("Bleach cures COVID", ttl=TTL)
+        clock.now += TTL - 1
+        # Same key after normalization
+        assert await searcher.search("  bleach   cures covid ", ttl=TTL) == first
+        assert upstream.calls == 1
+        assert searcher.cache_stats()["hits"] == 1 and searcher.cache_stats()["misses"] == 1
+
+    _run(test)
+
+
+def test_stale_entry_is_served_and_refreshed_once():
+    async def test(searcher, clock, upstream):
+        first = await searcher.search("claim", ttl=TTL)
+        clock.now += TTL + 1
+        upstream.gate = asyncio.Event()
+
+        # Several stale readers: all answered at once, one background refresh
+        stale = await asyncio.gather(*(searcher.search("claim", ttl=TTL) for _ in range(3)))
+        assert stale == [first] * 3
+        assert searcher.stale_hits == 3
+        await _settle()
+        assert upstream.calls == 2
+
+        upstream.gate.set()
+        await _settle()
+        refreshed = await searcher.search("claim", ttl=TTL)
+        assert refreshed[0]["title"] == "result 2"
+        assert searcher.cache_hits == 1 and upstream.calls == 2
+
+    _run(test)
+
+
+def test_expired_entry_is_fetched_again():
+    async def test(searcher, clock, upstream):
+        await searcher.search("claim", ttl=TTL)
+        clock.now += TTL + STALE + 1
+        results = await searcher.search("claim", ttl=TTL)
+        assert results[0]["title"] == "result 2"
+        assert searcher.stale_hits == 0 and searcher.cache_misses == 2
+
+    _run(test)
+
+
+def test_failed_refresh_keeps_serving_stale():
+    async def test(searcher, clock, upstream):
+        first = await searcher.search("claim", ttl=TTL)
+        clock.now += TTL + 1
+        upstream.fail = True
+
+        assert await searcher.search("claim", ttl=TTL) == first
+        await _settle()
+        assert upstream.calls == 2 and not searcher._refreshes
+
+        # Still stale, so the next reader tries again
+        assert await searcher.search("claim", ttl=TTL) == first
+        await _settle()
+        assert upstream.calls == 3
+
+        upstream.fail = False
+        await searcher.search("claim", ttl=TTL)
+        await _settle()
+        assert (await searcher.search("claim", ttl=TTL))[0]["title"] == "result 4"
+
+    _run(test)
+
+
+def test_failed_search_is_not_cached():
+    async def test(searcher, clock, upstream):
+        upstream.fail = True
+        try:
+            await searcher.search("claim", ttl=TTL)
+            raise AssertionError("expected the upstream error")
+        except RuntimeError:
+            pass
+        upstream.fail = False
+        assert (await searcher.search("claim", ttl=TTL))[0]["title"] == "result 2"
+
+    _run(test)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
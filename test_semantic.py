@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for semantic claim vectors
+Run: python test_semantic.py (or pytest)
+"""
+import asyncio
+import os
+import tempfile
+
+import semantic
+from memory import Memory
+
+
+def _score(a: str, b: str) -> float:
+    return semantic.cosine(semantic.embed(a), semantic.embed(b))
+
+
+def test_swapped_roles_do_not_match():
+    assert _score("vaccines cause autism", "autism causes vaccines") < 0.85
+    assert _score("drinking bleach cures covid", "covid cures drinking bleach") < 0.85
+
+
+def test_passive_paraphrase_still_matches():
+    assert _score("vaccines cause autism", "autism is caused by vaccination") > 0.99
+    assert _score("5G towers spread coronavirus", "coronavirus is spread by 5G towers") > 0.99
+
+
+def _index(claims: list, **kwargs) -> semantic.VectorIndex:
+    index = semantic.VectorIndex(**kwargs)
+    for claim_id, claim in enumerate(claims, 1):
+        index.add(claim_id, semantic.pack(semantic.embed(claim)))
+    return index
+
+
+def test_index_scores_packed_vectors_by_cosine():
+    claims = ["vaccines cause autism", "bleach cures covid", "the moon landing was faked"]
+    index = _index(claims)
+    query = semantic.embed("autism is caused by vaccination")
+    (best_id, score), *_ = index.search(query, k=3)
+    assert best_id == 1
+    assert abs(score - _score("autism is caused by vaccination", claims[0])) < 1e-5
+
+    # Re-adding replaces; removing forgets the postings too
+    index.add(1, semantic.pack(semantic.embed("bleach cures covid")))
+    assert len(index) == 3 and 1 not in [hit[0] for hit in index.search(query)]
+    index.remove(1)
+    index.remove(2)
+    assert len(index) == 1 and index.search(semantic.embed("bleach cures covid")) == []
+
+
+def test_index_keeps_at_most_max_items():
+    claims = [f"claim about topic {word}" for word in ("alpha", "beta", "gamma", "delta", "epsilon")]
+    index = _index(claims, max_items=3)
+    assert len(index) == 3 and index.evicted == 2
+    # The oldest went first and left no postings behind
+    assert {hit[0] for hit in index.search(semantic.embed("claim about topic"), k=5)} == {3, 4, 5}
+    assert not any(1 in posting or 2 in posting for posting in index._postings.values())
+
+    # A re-added claim counts as new
+    index.add(3, semantic.pack(semantic.embed(claims[2])))
+    index.add(6, semantic.pack(semantic.embed("claim about topic zeta")))
+    assert {hit[0] for hit in index.search(semantic.embed("claim about topic"), k=5)} == {3, 5, 6}
+
+
+def test_memory_does_not_serve_a_swapped_claim():
+    async def run():
+        memory = Memory(":memory:", semantic_match=True, semantic_threshold=0.85)
+        await memory.init_db()
+        try:
+            await memory.store_claim("vaccines cause autism", {"verdict": "false", "confidence": 95})
+            assert await memory.get_cached_verdict("autism causes vaccines") is None
+            match = await memory.get_cached_verdict("autism is caused by vaccination")
+            assert match["match_type"] == "semantic"
+        finally:
+            await memory.close()
+
+    asyncio.run(run())
+
+
+def test_index_is_loaded_on_startup():
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "claims.db")
+            memory = Memory(path)
+            await memory.init_db()
+            # Stored without vectors: embedded and saved while loading
+            for claim in ("vaccines cause autism", "bleach cures covid", "the moon landing was faked"):
+                await memory.store_claim(claim, {"verdict": "false", "confidence": 90})
+            await memory.close()
+
+            memory = Memory(path, semantic_match=True, semantic_max_vectors=2)
+            await memory.init_db()
+            try:
+                assert memory.cache_stats()["semantic_vectors"] == 2
+                assert memory.cache_stats()["semantic_vectors_evicted"] == 1
+                match = await memory.get_cached_verdict("covid is cured by bleach")
+                assert match["match_type"] == "semantic"
+                # The oldest claim was dropped from the index only
+                assert await memory.get_cached_verdict("autism is caused by vaccination") is None
+                assert (await memory.get_cached_verdict("vaccines cause autism"))["match_type"] == "exact"
+            finally:
+                await memory.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for SingleFlight (coalesced concurrent calls)
+Run: python test_singleflight.py (or pytest)
+"""
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight, calls = SingleFlight(), []
+        release = asyncio.Event()
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "verdict"
+
+        callers = [asyncio.create_task(flight.do("claim", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.inflight == 1 and flight.running("claim")
+        release.set()
+        results = await asyncio.gather(*callers)
+
+        assert calls == [1]
+        assert [result for result, _ in results] == ["verdict"] * 3
+        assert sorted(shared for _, shared in results) == [False, True, True]
+        assert flight.shared == 2
+        assert flight.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_different_keys_and_later_calls_run_again():
+    async def run():
+        flight, calls = SingleFlight(), []
+
+        async def work(key):
+            calls.append(key)
+            return key
+
+        assert await asyncio.gather(flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b"))) == [
+            ("a", False), ("b", False)
+        ]
+        assert await flight.do("a", lambda: work("a")) == ("a", False)
+        assert calls == ["a", "b", "a"]
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        leader = asyncio.create_task(flight.do("claim", work))
+        follower = asyncio.create_task(flight.do("claim", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == (42, True)
+        assert leader.cancelled()
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_caller_and_are_forgotten():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            flight.do("claim", fail), flight.do("claim", fail), return_exceptions=True
+        )
+        assert [str(e) for e in results] == ["upstream down"] * 2
+        assert not flight.running("claim")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
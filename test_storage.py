@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Storage contract tests, run against every backend that is available here:
+SQLite always, PostgreSQL when asyncpg is installed and TEST_DATABASE_URL
+points at a database the tests may create a scratch schema in.
+Run: python test_storage.py (or pytest)
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import claim_index
+from storage import QUEUED, RUNNING, SQLiteStorage
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+class Skipped(Exception):
+    pass
+
+
+def _skip(reason: str):
+    # Reported as a skip under pytest; the script runner below catches Skipped
+    if pytest is not None and "PYTEST_CURRENT_TEST" in os.environ:
+        pytest.skip(reason)
+    raise Skipped(reason)
+
+
+@asynccontextmanager
+async def _sqlite() -> AsyncIterator[SQLiteStorage]:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStorage(os.path.join(tmp, "claims.db"), read_pool_size=2)
+        await store.connect()
+        await store.migrate()
+        try:
+            yield store
+        finally:
+            await store.close()
+
+
+@asynccontextmanager
+async def _postgres():
+    if asyncpg is None:
+        _skip("asyncpg is not installed")
+    if not TEST_DATABASE_URL:
+        _skip("TEST_DATABASE_URL is not set")
+    from storage_pg import PostgresStorage
+
+    # A throwaway schema, so the tests never touch existing tables
+    schema = f"storage_test_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(TEST_DATABASE_URL)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    store = PostgresStorage(f"{TEST_DATABASE_URL}{separator}search_path={schema}", pool_size=4)
+    try:
+        await store.connect()
+        await store.migrate()
+        yield store
+    finally:
+        await store.close()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+def _record(claim: str, verdict: str, url: str = "") -> dict:
+    normalized = claim.lower()
+    result = {
+        "verdict": verdict,
+        "confidence": 80,
+        "evidence_for": [{"url": url, "title": "source"}] if url else [],
+        "evidence_against": [],
+    }
+    return {
+        "claim_hash": f"hash:{normalized}",
+        "claim_text": claim,
+        "normalized_claim": normalized,
+        "verdict": verdict,
+        "confidence": 80,
+        "risk_level": "low",
+        "topic": "health",
+        "result": result,
+        "embedding": None,
+        "buckets": claim_index.bucket_keys(normalized),
+    }
+
+
+def _run(backend, check):
+    async def run():
+        async with backend() as store:
+            await check(store)
+
+    asyncio.run(run())
+
+
+async def _check_upsert_and_read(store):
+    first, second = _record("Bleach cures COVID", "false", "https://who.int/a"), _record("Water is wet", "true")
+    ids = await store.upsert_claims([first, second])
+    assert len(set(ids)) == 2
+
+    row = await store.get_claim(first["claim_hash"])
+    assert row["id"] == ids[0]
+    assert row["claim_text"] == "Bleach cures COVID"
+    assert row["result"]["evidence_for"][0]["url"] == "https://who.int/a"
+    assert await store.get_claim("hash:missing") is None
+    assert set(await store.get_claims(ids)) == set(ids)
+
+    # Overwrites keep the row id
+    again = await store.upsert_claims([_record("Bleach cures COVID", "uncertain")])
+    assert again == [ids[0]]
+    assert (await store.get_claim(first["claim_hash"]))["verdict"] == "uncertain"
+
+
+async def _check_change_feed_sees_overwrites(store):
+    record = _record("Bleach cures COVID", "false")
+    marker = await store.change_marker()
+    (claim_id,) = await store.upsert_claims([record])
+    changed, changes, marker = await store.poll_changes(marker, with_vectors=False)
+    assert changed and [(c[0], c[1]) for c in changes] == [(claim_id, record["claim_hash"])]
+
+    # Same claim again within the same second: still a change
+    await store.upsert_claims([_record("Bleach cures COVID", "true")])
+    changed, changes, marker = await store.poll_changes(marker, with_vectors=False)
+    assert [c[1] for c in changes] == [record["claim_hash"]]
+
+    _, changes, _ = await store.poll_changes(marker, with_vectors=False)
+    assert changes == []
+
+
+async def _check_counters(store):
+    await store.upsert_claims([
+        _record("Bleach cures COVID", "false"),
+        _record("Water is wet", "true"),
+        _record("The moon is cheese", "false"),
+    ])
+    await store.upsert_claims([_record("The moon is cheese", "uncertain")])
+    counters = await store.claim_counters()
+    assert counters["total"] == 3
+    assert counters["verdict:false"] == 1
+    assert counters["verdict:true"] == 1
+    assert counters["verdict:uncertain"] == 1
+
+
+async def _check_load_embeddings_in_batches(store):
+    records = [_record(f"Claim number {i}", "false") for i in range(5)]
+    records[1]["embedding"] = b"stored"
+    ids = await store.upsert_claims(records)
+    embedded = []
+
+    def embed(text: str) -> bytes:
+        embedded.append(text)
+        return text.encode()
+
+    batches = []
+    async for batch in store.load_embeddings(embed, batch_size=2):
+        if not batches:
+            # Nothing is held between batches: writes go through
+            ids += await asyncio.wait_for(store.upsert_claims([_record("Written while loading", "true")]), 1)
+        batches.append(batch)
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    loaded = dict(pair for batch in batches for pair in batch)
+    assert list(loaded) == ids
+    assert loaded[ids[1]] == b"stored" and loaded[ids[0]] == b"Claim number 0"
+    assert len(embedded) == 5
+
+    # Backfilled vectors were saved
+    embedded.clear()
+    async for batch in store.load_embeddings(embed):
+        assert dict(batch) == loaded
+    assert embedded == []
+
+
+async def _check_job_claims(store):
+    await store.init_jobs()
+    for job_id, priority, created_at in (("low", 2, 1.0), ("high", 0, 2.0)):
+        await store.insert_job({
+            "id": job_id, "claim": job_id, "context": None, "priority": priority,
+            "status": QUEUED, "callback_url": None, "created_at": created_at,
+        })
+
+    _, job = await store.claim_job(now=100.0, lease=10.0)
+    assert job["id"] == "high"
+    _, job = await store.claim_job(now=100.0, lease=10.0)
+    assert job["id"] == "low"
+    assert await store.claim_job(now=100.0, lease=10.0) == (0, None)
+    assert (await store.get_job("high"))["status"] == RUNNING
+
+    # Both leases lapse: the next claim requeues them and takes the first again
+    requeued, job = await store.claim_job(now=200.0, lease=10.0)
+    assert requeued == 2 and job["id"] == "high"
+    assert (await store.get_job("high"))["attempts"] == 2
+
+
+def test_sqlite_upsert_and_read():
+    _run(_sqlite, _check_upsert_and_read)
+
+
+def test_sqlite_change_feed_sees_overwrites():
+    _run(_sqlite, _check_change_feed_sees_overwrites)
+
+
+def test_sqlite_counters():
+    _run(_sqlite, _check_counters)
+
+
+def test_sqlite_job_claims():
+    _run(_sqlite, _check_job_claims)
+
+
+def test_sqlite_load_embeddings_in_batches():
+    _run(_sqlite, _check_load_embeddings_in_batches)
+
+
+def test_postgres_upsert_and_read():
+    _run(_postgres, _check_upsert_and_read)
+
+
+def test_postgres_change_feed_sees_overwrites():
+    _run(_postgres, _check_change_feed_sees_overwrites)
+
+
+def test_postgres_counters():
+    _run(_postgres, _check_counters)
+
+
+def test_postgres_load_embeddings_in_batches():
+    _run(_postgres, _check_load_embeddings_in_batches)
+
+
+def test_postgres_job_claims():
+    _run(_postgres, _check_job_claims)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                test()
+            except Skipped as skipped:
+                print(f"⏭️  {name} (skipped: {skipped})")
+                continue
+            print(f"✅ {name}")
@@ -66,6 +66,8 @@ async def test_memory():
         similar = await memory.find_similar_claim("Test claim")
         assert similar is not None
         assert similar["verdict"] == "false"
+        assert similar["json_blob"]["verdict"] == "false"
+        await memory.close()
         
         print("✅ Memory system working")
         return True
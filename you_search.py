@@ -1,27 +1,172 @@
 # you_search.py
+import asyncio
+import importlib.util
+import time
 import httpx
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
+from cache import SQLiteStore, TTLCache
 from config import config
+from metrics import timed
+from outbound import CircuitBreaker, OutboundPolicy
+from scheduler import PriorityLimiter
+from singleflight import SingleFlight
+
+# httpx speaks HTTP/2 only when the optional h2 package is installed
+_HTTP2 = importlib.util.find_spec("h2") is not None
 
 
 class YouSearcher:
     def __init__(self):
         self.api_key = (config.YOU_API_KEY or "").strip()
-        self.base_url = "https://ydc-index.io/v1/search"
+        self.base_url = config.YOU_SEARCH_URL
+        # One pooled client per process, created on first use and closed on app shutdown
+        self._client: Optional[httpx.AsyncClient] = None
+        # Identical queries already on the wire share one request
+        self._inflight: SingleFlight[List[Dict[str, Any]]] = SingleFlight()
+        # Global cap on outbound searches; urgent requests get freed slots first
+        self.limiter = PriorityLimiter(config.SEARCH_CONCURRENCY)
+        # Quota throttling, retries on 429/5xx (honoring Retry-After), circuit breaker
+        self.outbound = OutboundPolicy(
+            "you.com",
+            rate=config.SEARCH_RATE_PER_S,
+            burst=config.SEARCH_BURST,
+            max_retries=config.OUTBOUND_MAX_RETRIES,
+            backoff_base=config.OUTBOUND_BACKOFF_BASE_S,
+            backoff_max=config.OUTBOUND_BACKOFF_MAX_S,
+            breaker=CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET_S),
+        )
+
+        # Result cache: in-process LRU, optionally backed by SQLite across restarts.
+        # Entries are fresh for `ttl`, then served stale (and refreshed in the
+        # background) for SEARCH_CACHE_STALE_S more.
+        self._cache = TTLCache(config.SEARCH_CACHE_SIZE)
+        self._store = (
+            SQLiteStore(config.SEARCH_CACHE_PATH, "search_cache")
+            if config.SEARCH_CACHE_PATH else None
+        )
+        self._refreshes: Set[asyncio.Task] = set()
+        self.cache_hits = 0
+        self.stale_hits = 0
+        self.cache_misses = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=20.0,
+                http2=_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=config.SEARCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.SEARCH_MAX_CONNECTIONS,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        for task in list(self._refreshes):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._store is not None:
+            await self._store.close()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.cache_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.cache_misses,
+            "entries": len(self._cache),
+            "persistent": self._store is not None,
+        }
+
+    @staticmethod
+    def _cache_key(query: str, num_results: int) -> str:
+        return f"{int(num_results)}:{' '.join(query.lower().split())}"
+
+    async def _cache_get(self, key: str) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """(results, fresh_until) from the LRU, falling back to the SQLite store"""
+        entry = self._cache.get(key)
+        if entry is not None or self._store is None:
+            return entry
+        try:
+            stored = await self._store.get(key)
+        except Exception as e:
+            print(f"[YouSearcher] cache read failed: {e}")
+            return None
+        if stored is None:
+            return None
+        results, fresh_until, expires_at = stored
+        self._cache.set(key, (results, fresh_until), ttl=expires_at - time.time())
+        return results, fresh_until
 
-    async def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+    async def _fetch(self, key: str, query: str, num_results: int, ttl: float) -> List[Dict[str, Any]]:
+        results = await self._search(query, num_results)
+        if results:
+            now = time.time()
+            fresh_until, expires_at = now + ttl, now + ttl + config.SEARCH_CACHE_STALE_S
+            self._cache.set(key, (results, fresh_until), ttl=expires_at - now)
+            if self._store is not None:
+                try:
+                    await self._store.set(key, results, fresh_until, expires_at)
+                except Exception as e:
+                    print(f"[YouSearcher] cache write failed: {e}")
+        return results
+
+    def _revalidate(self, key: str, query: str, num_results: int, ttl: float) -> None:
+        async def refresh() -> None:
+            try:
+                await self._inflight.do(key, lambda: self._fetch(key, query, num_results, ttl))
+            except Exception as e:
+                print(f"[YouSearcher] background refresh failed: {e}")
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def search(
+        self, query: str, num_results: int = 5, ttl: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Cached search; `ttl` overrides SEARCH_CACHE_TTL_S (seconds fresh) for this query"""
+        ttl = config.SEARCH_CACHE_TTL_S if ttl is None else ttl
+        key = self._cache_key(query, num_results)
+
+        cached = await self._cache_get(key)
+        if cached is not None:
+            results, fresh_until = cached
+            if time.time() < fresh_until:
+                self.cache_hits += 1
+            else:
+                # Stale-while-revalidate: answer now, refresh once in the background
+                self.stale_hits += 1
+                if not self._inflight.running(key):
+                    self._revalidate(key, query, num_results, ttl)
+            return list(results)
+
+        self.cache_misses += 1
+        results, _ = await self._inflight.do(
+            key, lambda: self._fetch(key, query, num_results, ttl)
+        )
+        return list(results)
+
+    async def _search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
         if not self.api_key:
             raise RuntimeError("YOU_API_KEY is missing")
 
         headers = {"X-API-Key": self.api_key}
         params = {"query": query, "count": int(num_results)}
 
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            resp = await client.get(self.base_url, headers=headers, params=params)
+        async def attempt() -> httpx.Response:
+            # A slot per attempt: retry backoff does not hold one
+            async with self.limiter.slot():
+                resp = await self._get_client().get(self.base_url, headers=headers, params=params)
             # 🔥 Print once so you can verify server is using this code path
             print(f"[YouSearcher] {resp.status_code} query='{query[:50]}'")
             resp.raise_for_status()
-            data = resp.json()
+            return resp
+
+        resp = await self.outbound.call(attempt)
+        data = resp.json()
 
         web = (data.get("results") or {}).get("web") or []
         out: List[Dict[str, Any]] = []
@@ -37,7 +182,10 @@ class YouSearcher:
             )
         return out
 
-    async def retrieve_evidence(self, claim: str) -> Dict[str, List[Dict[str, Any]]]:
-        support = await self.search(claim, num_results=5)
-        refute = await self.search(f"debunk {claim}", num_results=5)
+    async def retrieve_evidence(self, claim: str, num_results: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        # Support and refute queries are independent; run them in one round trip
+        support, refute = await asyncio.gather(
+            timed("search.support", self.search(claim, num_results=num_results)),
+            timed("search.refute", self.search(f"debunk {claim}", num_results=num_results)),
+        )
         return {"support": support, "refute": refute, "all": support + refute}